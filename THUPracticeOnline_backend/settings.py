@@ -51,6 +51,8 @@ INSTALLED_APPS = [
     'handbooks.apps.HandbooksConfig',
     'logs.apps.LogsConfig',
     'votes.apps.VotesConfig',
+    'mails.apps.MailsConfig',
+    'events.apps.EventsConfig',
 ]
 
 MIDDLEWARE = [
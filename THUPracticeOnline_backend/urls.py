@@ -29,4 +29,5 @@ urlpatterns = [
     path('api/handbook/', include('handbooks.urls')),
     path('api/log/', include('logs.urls')),
     path('api/vote/', include('votes.urls')),
+    path('api/event/', include('events.urls')),
 ]
@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from .models import ApprovalManageModel
+
+REVIEWER_CHAIN_KEY = 'approval_reviewer_chain'
+REVIEWER_CHAIN_TIMEOUT = 60 * 60 * 24
+
+class ReviewerChain:
+    "按审核顺序排列的审核人，保存审核人主键、邮箱及主键到位置的映射"
+    def __init__(self, reviewers : list):
+        self.ids = [reviewer_id for reviewer_id, _ in reviewers]
+        self.emails = [email for _, email in reviewers]
+        self.positions = {reviewer_id: position for position, reviewer_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, position : int) -> tuple | None :
+        "返回（审核人主键，邮箱），位置不存在时返回None"
+        if 0 <= position < len(self.ids):
+            return self.ids[position], self.emails[position]
+        return None
+
+    def first(self) -> tuple | None :
+        return self.get(0)
+
+    def last(self) -> tuple | None :
+        return self.get(len(self.ids) - 1)
+
+    def next_of(self, reviewer_id) -> tuple | None :
+        "下一位审核人，审核人不在流程中或已是最后一位时返回None"
+        position = self.positions.get(reviewer_id)
+        return None if position is None else self.get(position + 1)
+
+def get_reviewer_chain() -> ReviewerChain :
+    "从缓存中获取审核流程，未命中时查询一次数据库"
+    reviewers = cache.get(REVIEWER_CHAIN_KEY)
+    if reviewers is None :
+        reviewers = list(ApprovalManageModel.objects.order_by('order').values_list('reviewer_id', 'reviewer__email'))
+        cache.set(REVIEWER_CHAIN_KEY, reviewers, timeout=REVIEWER_CHAIN_TIMEOUT)
+    return ReviewerChain(reviewers)
+
+def invalidate_reviewer_chain() :
+    cache.delete(REVIEWER_CHAIN_KEY)
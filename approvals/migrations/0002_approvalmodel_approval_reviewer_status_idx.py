@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('approvals', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='approvalmodel',
+            index=models.Index(fields=['reviewer', 'status', 'id'], name='approval_reviewer_status_idx'),
+        ),
+    ]
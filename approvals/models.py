@@ -28,7 +28,22 @@ class ApprovalModel(models.Model):
     def __str__(self) -> str:
         return f"{self.sender.username}的推送审核"
 
+    class Meta:
+        indexes = [
+            # 审核人待审列表：按审核人、状态筛选并按主键排序
+            models.Index(fields=['reviewer', 'status', 'id'], name='approval_reviewer_status_idx'),
+        ]
+
     def get_status(self):
         """获取中文状态"""
         status_dict = dict(self.APPROVAL_STATUS)
-        return status_dict.get(self.status, self.status)
\ No newline at end of file
+        return status_dict.get(self.status, self.status)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录从数据库读取时的状态和审核人，保存时据此判断是否需要推送事件
+        instance._loaded_state = {
+            name: value for name, value in zip(field_names, values) if name in ('status', 'reviewer_id')
+        }
+        return instance
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import ApprovalModel, ApprovalManageModel
+from .cache import invalidate_reviewer_chain
+from users.models import CustomUser
+from utils.events import publish_events
+
+@receiver([post_save, post_delete], sender=ApprovalManageModel)
+def invalidate_reviewer_chain_on_write(sender, **kwargs):
+    " 审核流程变化时清除缓存 "
+    invalidate_reviewer_chain()
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_reviewer_chain_on_email_change(sender, instance, update_fields=None, **kwargs):
+    " 缓存中保存了审核人邮箱，只更新其他字段（如登录时间）时无需清除 "
+    if update_fields is None or 'email' in update_fields:
+        invalidate_reviewer_chain()
+
+@receiver(post_save, sender=ApprovalModel)
+def publish_approval_event(sender, instance, created, **kwargs):
+    " 新的待审推送通知审核人，状态变化通知送审人 "
+    loaded = getattr(instance, '_loaded_state', {})
+    data = {'id': instance.id, 'status': instance.status, 'reviewer': instance.reviewer_id}
+    if created or loaded.get('reviewer_id', instance.reviewer_id) != instance.reviewer_id:
+        publish_events([instance.reviewer_id], 'approval_review', data)
+    if not created and loaded.get('status', instance.status) != instance.status:
+        publish_events([instance.sender_id], 'approval_status', data)
+    instance._loaded_state = {'status': instance.status, 'reviewer_id': instance.reviewer_id}
@@ -5,6 +5,10 @@ from rest_framework import status
 from .models import ApprovalManageModel, ApprovalModel
 from users.models import CustomUser
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .cache import get_reviewer_chain
+from mails.models import OutboxMail
 
 class BaseTestCase(APITestCase):
     def setUp(self):
@@ -117,6 +121,24 @@ class ApprovalWorkflowTests(BaseTestCase):
         self.approval.refresh_from_db()
         self.assertEqual(self.approval.status, 'approve')
 
+    def test_reviewer_chain_cached(self):
+        """测试审核流程从缓存读取，审核操作只更新一次推送"""
+        self.client.cookies['access_token'] = self.token
+        get_reviewer_chain()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('pass-down'), {'id': self.approval.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        queries = [query['sql'] for query in context.captured_queries]
+        self.assertFalse(any(ApprovalManageModel._meta.db_table in sql for sql in queries))
+        self.assertEqual(len([sql for sql in queries if sql.startswith('UPDATE')]), 1)
+
+    def test_pass_down_by_last_reviewer(self):
+        self.approval.reviewer = self.super_admin
+        self.approval.save()
+        url = reverse('pass-down')
+        response = self.client.post(url, {'id': self.approval.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 class ManageApprovalViewTests(BaseTestCase):
     def test_manage_approval_flow(self):
         self.client.cookies['access_token'] = self.valid_token
@@ -138,6 +160,52 @@ class ManageApprovalViewTests(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(ApprovalManageModel.objects.count(), 2)
 
+    def test_reassign_pending_approvals(self):
+        """测试替换审核流程时未通过的推送一次更新给第一位审核人"""
+        ApprovalModel.objects.bulk_create(
+            ApprovalModel(sender=self.user1, sender_name='user1', link=f'https://example.com/{i}', reviewer=self.admin,
+                          status='approve' if i % 5 == 0 else 'review')
+            for i in range(50)
+        )
+        self.client.cookies['access_token'] = self.valid_token
+        # 校验、删除旧流程、插入新流程、更新推送的查询次数与推送数量无关
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('manage'), {'username': ['user1', 'superadmin']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(len(context.captured_queries), 15)
+        self.assertEqual(ApprovalModel.objects.filter(reviewer=self.user1).count(), 40)
+        self.assertEqual(ApprovalModel.objects.filter(reviewer=self.admin, status='approve').count(), 10)
+        self.assertEqual(
+            list(ApprovalManageModel.objects.order_by('order').values_list('reviewer_id', flat=True)),
+            [self.user1.id, self.super_admin.id]
+        )
+
+    def test_manage_with_missing_user(self):
+        self.client.cookies['access_token'] = self.valid_token
+        response = self.client.post(reverse('manage'), {'user-id': [self.admin.id, 10000]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], '主键为10000的用户不存在')
+        # 校验失败时原有审核流程不变
+        self.assertEqual(ApprovalManageModel.objects.count(), 2)
+
+    def test_manage_with_invalid_list(self):
+        self.client.cookies['access_token'] = self.valid_token
+        response = self.client.post(reverse('manage'), {'username': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('manage'), {'username': ['admin', 'admin']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reviewer_chain_rebuilt(self):
+        """测试修改审核流程后缓存重新生成"""
+        self.assertEqual(get_reviewer_chain().ids, [self.admin.id, self.super_admin.id])
+        self.client.cookies['access_token'] = self.valid_token
+        response = self.client.post(reverse('manage'), {'user-id': [self.super_admin.id, self.user1.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        chain = get_reviewer_chain()
+        self.assertEqual(chain.ids, [self.super_admin.id, self.user1.id])
+        self.assertEqual(chain.next_of(self.super_admin.id), (self.user1.id, self.user1.email))
+        self.assertIsNone(chain.next_of(self.admin.id))
+
 class ModifyApprovalViewTests(BaseTestCase):
     def setUp(self):
         super().setUp()
@@ -199,4 +267,80 @@ class PermissionCheckTests(BaseTestCase):
     def test_check_reviewer(self):
         from utils.check import check_reviewer
         self.assertTrue(check_reviewer(self.admin, self.admin))
-        self.assertFalse(check_reviewer(self.admin, self.user1))
\ No newline at end of file
+        self.assertFalse(check_reviewer(self.admin, self.user1))
+
+class BatchApprovalViewTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.approvals = [
+            ApprovalModel.objects.create(sender=sender, sender_name=sender.username, link=f'https://example.com/{i}', reviewer=self.admin)
+            for i, sender in enumerate([self.user1, self.user1, self.user2])
+        ]
+        self.ids = [approval.id for approval in self.approvals]
+
+    def test_batch_pass_down(self):
+        self.client.cookies['access_token'] = self.token
+        response = self.client.post(reverse('batch-pass-down'), {'ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(ApprovalModel.objects.filter(reviewer=self.super_admin).count(), 3)
+        # 下一位审核人只收到一封邮件
+        self.assertEqual(list(OutboxMail.objects.values_list('recipients', flat=True)), [[self.super_admin.email]])
+
+    def test_batch_reject(self):
+        self.client.cookies['access_token'] = self.token
+        response = self.client.post(reverse('batch-reject'), {'ids': self.ids, 'message': '需要修改'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(ApprovalModel.objects.filter(status='reject', message='需要修改').count(), 3)
+        # 每位送审人一封邮件
+        self.assertEqual(
+            sorted(OutboxMail.objects.values_list('recipients', flat=True)),
+            [[self.user1.email], [self.user2.email]]
+        )
+
+    def test_batch_approve(self):
+        response = self.client.post(reverse('batch-approve'), {'ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(ApprovalModel.objects.filter(status='approve').count(), 3)
+        self.client.cookies['access_token'] = self.token
+        response = self.client.post(reverse('batch-approve'), {'ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_not_reviewer(self):
+        """测试包含其他审核人的推送时整批不处理"""
+        self.approvals[0].reviewer = self.super_admin
+        self.approvals[0].save()
+        self.client.cookies['access_token'] = self.token
+        response = self.client.post(reverse('batch-reject'), {'ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], f'您无权操作id={self.ids[0]}的推送')
+        self.assertFalse(ApprovalModel.objects.filter(status='reject').exists())
+
+    def test_batch_missing_approval(self):
+        self.client.cookies['access_token'] = self.token
+        response = self.client.post(reverse('batch-pass-down'), {'ids': self.ids + [10000]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'id=10000的推送审核不存在')
+
+class QueueSummaryViewTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, (reviewer, approval_status) in enumerate([
+            (self.admin, 'review'), (self.admin, 'review'), (self.admin, 'reject'), (self.super_admin, 'review'), (self.super_admin, 'approve'),
+        ]):
+            ApprovalModel.objects.create(sender=self.user1, sender_name='user1', link=f'https://example.com/{i}', reviewer=reviewer, status=approval_status)
+
+    def test_queue_summary(self):
+        self.client.get(reverse('queue-summary'))
+        # 用户已缓存后只有一次聚合查询
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('queue-summary'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 5)
+        self.assertEqual(response.data['status'], {'review': 3, 'reject': 1, 'approve': 1})
+        self.assertEqual(response.data['reviewers'][0], {'reviewer': self.admin.id, 'username': 'admin', 'review': 2, 'reject': 1, 'approve': 0})
+
+    def test_permission_denied(self):
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user1).access_token)
+        response = self.client.get(reverse('queue-summary'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import SendApprovalView, QueryApprovalView, PassDownApprovalView, RejectApprovalView, ApproveApprovalView, QueryStatusView, ModifyApprovalView, ManageApprovalView, QueryReviewerView
+from .views import SendApprovalView, QueryApprovalView, PassDownApprovalView, RejectApprovalView, ApproveApprovalView, QueryStatusView, ModifyApprovalView, ManageApprovalView, QueryReviewerView, BatchPassDownApprovalView, BatchRejectApprovalView, BatchApproveApprovalView, QueueSummaryView
 
 urlpatterns = [
     path('send/', SendApprovalView.as_view(), name='send'),
@@ -7,8 +7,12 @@ urlpatterns = [
     path('pass-down/', PassDownApprovalView.as_view(), name='pass-down'),
     path('reject/', RejectApprovalView.as_view(), name='reject'),
     path('approve/', ApproveApprovalView.as_view(), name='approve'),
+    path('batch-pass-down/', BatchPassDownApprovalView.as_view(), name='batch-pass-down'),
+    path('batch-reject/', BatchRejectApprovalView.as_view(), name='batch-reject'),
+    path('batch-approve/', BatchApproveApprovalView.as_view(), name='batch-approve'),
     path('query-status/', QueryStatusView.as_view(), name='query-status'),
     path('modify/', ModifyApprovalView.as_view(), name='approval-modify'),
     path('manage/', ManageApprovalView.as_view(), name='manage'),
     path('query-reviewer/', QueryReviewerView.as_view(), name='query-reviewer'),
+    path('queue-summary/', QueueSummaryView.as_view(), name='queue-summary'),
 ]
\ No newline at end of file
@@ -2,11 +2,16 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
-from utils.check import check_reviewer, check_super_administrator_from_request, check_user_id_list, check_username_list
+from utils.check import check_reviewer, check_administrator_from_request, check_super_administrator_from_request, check_user_id_list, check_username_list
 from utils.get import get_user_from_request
 from .serializers import ApprovalSerializer, ReviewApprovalSerializer, QueryStatusSerializer, ReviewerSerializer
 from utils.pagination import CustomPagination
+from utils.cache import CachedResponseMixin, invalidate_response_cache
+from utils.events import publish_events
+from django.db import transaction
+from django.db.models import Count
 from .models import ApprovalModel, ApprovalManageModel
+from .cache import get_reviewer_chain, invalidate_reviewer_chain
 from users.models import CustomUser
 from utils.send import send_email
 
@@ -21,16 +26,16 @@ class SendApprovalView(APIView):
         
         # 创建审核
         data['sender'] = user.id
-        try :
-            reviewer = ApprovalManageModel.objects.get(order=1).reviewer
-            data['reviewer'] = reviewer.id
-        except ApprovalManageModel.DoesNotExist:
+        first = get_reviewer_chain().first()
+        if first is None :
             return Response({'error':'审核人未定义，请联系管理员'}, status=status.HTTP_400_BAD_REQUEST) 
+        reviewer_id, reviewer_email = first
+        data['reviewer'] = reviewer_id
 
         send_email(
             subject="您有新的待审核的推送",
             content="您有新的待审核的推送，请登录https://THUPracticeOnline-frontend-THUPracticeOnline.app.spring25a.secoder.net查看",
-            receipient_list=[reviewer.email]
+            receipient_list=[reviewer_email]
         )        
 
         serializer = ApprovalSerializer(data=data)
@@ -56,35 +61,36 @@ class PassDownApprovalView(APIView):
         approval_id = request.data.get('id')
 
         approval = ApprovalModel.objects.get(id=approval_id)
-        now_reviewer = approval.reviewer
-        order = ApprovalManageModel.objects.get(reviewer=now_reviewer).order
         
         user = get_user_from_request(request)
         if isinstance(user, Response):
             return user
 
         # 检查当前用户是不是对应的审核人
-        if not check_reviewer(now_reviewer, user):
+        if not check_reviewer(approval.reviewer_id, user.id):
             return Response({'error':'您无权操作本篇推送'}, status=status.HTTP_400_BAD_REQUEST)
 
         # 检查当前推送状态是否正确
         if approval.status == 'approve' :
             return Response({'error':'当前推送审核已通过，无法操作'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try :
-            next_reviewer = ApprovalManageModel.objects.get(order=order+1).reviewer
-        except ApprovalManageModel.DoesNotExist:
+        chain = get_reviewer_chain()
+        if approval.reviewer_id not in chain.positions :
+            return Response({'error':'您不在审核流程中，无法传递给下一个审核人'}, status=status.HTTP_400_BAD_REQUEST)
+        next_reviewer = chain.next_of(approval.reviewer_id)
+        if next_reviewer is None :
             return Response({'error':'您已是最后一个审核人，无法传递给下一个审核人'}, status=status.HTTP_400_BAD_REQUEST)
+        next_reviewer_id, next_reviewer_email = next_reviewer
 
         send_email(
             subject="您有新的待审核的推送",
             content="您有新的待审核的推送，请登录https://THUPracticeOnline-frontend-THUPracticeOnline.app.spring25a.secoder.net查看",
-            receipient_list=[next_reviewer.email]
+            receipient_list=[next_reviewer_email]
         )        
 
-        approval.reviewer = next_reviewer
+        approval.reviewer_id = next_reviewer_id
         approval.message = ''
-        approval.save()
+        approval.save(update_fields=['reviewer', 'message'])
         return Response({'message':'操作成功'}, status=status.HTTP_200_OK)
 
 class RejectApprovalView(APIView):
@@ -94,15 +100,14 @@ class RejectApprovalView(APIView):
         approval_id = data.get('id')
         message = data.get('message')
 
-        approval = ApprovalModel.objects.get(id=approval_id)
-        now_reviewer = approval.reviewer
+        approval = ApprovalModel.objects.select_related('sender').get(id=approval_id)
 
         user = get_user_from_request(request)
         if isinstance(user, Response):
             return user
 
         # 检查当前用户是不是对应的审核人
-        if not check_reviewer(now_reviewer, user):
+        if not check_reviewer(approval.reviewer_id, user.id):
             return Response({'error':'您无权操作本篇推送'}, status=status.HTTP_400_BAD_REQUEST)
 
         # 检查当前推送状态是否正确
@@ -118,7 +123,7 @@ class RejectApprovalView(APIView):
         approval.status = 'reject'
         approval.message = message
 
-        approval.save()
+        approval.save(update_fields=['status', 'message'])
 
         return Response({'message':'操作成功'}, status=status.HTTP_200_OK)
 
@@ -132,13 +137,13 @@ class ApproveApprovalView(APIView):
             return user
 
         try :
-            approval = ApprovalModel.objects.get(id=approval_id)
+            approval = ApprovalModel.objects.select_related('sender').get(id=approval_id)
         except ApprovalModel.DoesNotExist:
             return Response({"error":f"id={approval_id}的推送审核不存在"}, status=status.HTTP_400_BAD_REQUEST)
 
-        final_reviewer = ApprovalManageModel.objects.all().order_by("-order")[0].reviewer
+        final_reviewer = get_reviewer_chain().last()
         # 检查当前用户是不是最终审核员
-        if not check_reviewer(final_reviewer, user) :
+        if final_reviewer is None or not check_reviewer(final_reviewer[0], user.id) :
             return Response({'error':'无权操作'}, status=status.HTTP_400_BAD_REQUEST)
 
         send_email(
@@ -149,7 +154,7 @@ class ApproveApprovalView(APIView):
 
         approval.status = 'approve'
         approval.message = ''
-        approval.save()
+        approval.save(update_fields=['status', 'message'])
 
         return Response({'message':'操作成功'}, status=status.HTTP_200_OK)
 
@@ -211,56 +216,181 @@ class ManageApprovalView(APIView):
             return Response({'error':'用户主键、用户名至少提供一个'}, status=status.HTTP_400_BAD_REQUEST)
         
         if not user_ids is None :
-            return self.create_from_id(user_ids)
-        
-        if not usernames is None :
-            return self.create_from_name(usernames)
+            reviewer_ids = check_user_id_list(user_ids)
+        else :
+            reviewer_ids = check_username_list(usernames)
+        if isinstance(reviewer_ids, Response) :
+            return reviewer_ids
+        return self.replace_chain(reviewer_ids)
+
+    def replace_chain(self, reviewer_ids):
+        "替换审核流程，未通过的推送全部交给第一位审核人"
+        first = reviewer_ids[0]
+        with transaction.atomic():
+            ApprovalManageModel.objects.all().delete()
+            ApprovalManageModel.objects.bulk_create(
+                ApprovalManageModel(reviewer_id=reviewer_id, order=order+1) for order, reviewer_id in enumerate(reviewer_ids)
+            )
+            reassigned = ApprovalModel.objects.exclude(status='approve').exclude(reviewer_id=first).update(reviewer_id=first)
+            # 批量写入不会触发信号，手动清除缓存并推送事件
+            invalidate_response_cache(ApprovalManageModel)
+            if reassigned :
+                publish_events([first], 'approval_reassigned', {'reviewer': first, 'count': reassigned})
+        invalidate_reviewer_chain()
 
-    def create_from_id(self, user_ids):
-        response = check_user_id_list(user_ids)
-        if isinstance(response, Response) :
-            return response
-        
-        ApprovalManageModel.objects.all().delete()
+        return Response({'message':'创建成功'}, status=status.HTTP_200_OK)
 
-        for order, user_id in enumerate(user_ids) :
-            user = CustomUser.objects.get(id = user_id)
-            ApprovalManageModel.objects.create(reviewer=user, order=order+1) 
-        
-        first = CustomUser.objects.get(id = user_ids[0])
+class QueueSummaryView(APIView):
+    "按审核人和状态统计推送数量，一次分组聚合查询"
+    def get(self, request):
+        if not check_administrator_from_request(request):
+            return Response({'error':'用户权限不足'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = ApprovalModel.objects.values('reviewer_id', 'reviewer__username', 'status').annotate(
+            count=Count('id')
+        ).order_by('reviewer_id', 'status')
+
+        statuses = [value for value, _ in ApprovalModel.APPROVAL_STATUS]
+        reviewers = {}
+        totals = dict.fromkeys(statuses, 0)
+        for row in rows:
+            reviewer = reviewers.setdefault(row['reviewer_id'], {
+                'reviewer': row['reviewer_id'],
+                'username': row['reviewer__username'],
+                **dict.fromkeys(statuses, 0),
+            })
+            reviewer[row['status']] = row['count']
+            totals[row['status']] = totals.get(row['status'], 0) + row['count']
+
+        return Response({
+            'reviewers': sorted(reviewers.values(), key=lambda reviewer: -reviewer['review']),
+            'status': totals,
+            'total': sum(totals.values()),
+        }, status=status.HTTP_200_OK)
+
+class QueryReviewerView(CachedResponseMixin, ListAPIView):
+    cache_models = (ApprovalManageModel, CustomUser)
+    pagination_class = CustomPagination
+    queryset = ApprovalManageModel.objects.all().order_by('order')
+    serializer_class = ReviewerSerializer
 
-        approvals = ApprovalModel.objects.all()
-        for approval in approvals :
-            if approval.status == 'approve' :
-                continue
-            approval.reviewer = first
-            approval.save()
+class BatchApprovalView(APIView):
+    "批量审核的基类，子类实现 check_reviewer 与 apply"
+    FRONTEND_URL = "https://THUPracticeOnline-frontend-THUPracticeOnline.app.spring25a.secoder.net"
 
-        return Response({'message':'创建成功'}, status=status.HTTP_200_OK)
-    
-    def create_from_name(self, usernames):
-        response = check_username_list(usernames)
-        if isinstance(response, Response) :
-            return response
-        
-        ApprovalManageModel.objects.all().delete()
+    def post(self, request):
+        user = get_user_from_request(request)
+        if isinstance(user, Response):
+            return user
 
-        for order, name in enumerate(usernames) :
-            user = CustomUser.objects.get(username = name)
-            ApprovalManageModel.objects.create(reviewer=user, order=order+1)
-        
-        first = CustomUser.objects.get(username = usernames[0])
+        data = request.data
+        ids = data.getlist('ids') if hasattr(data, 'getlist') else data.get('ids')
+        if not isinstance(ids, list) or len(ids) == 0:
+            return Response({'error':'请传入推送审核主键列表'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = list(dict.fromkeys(int(approval_id) for approval_id in ids))
+        except (TypeError, ValueError):
+            return Response({'error':'推送审核主键类型错误'}, status=status.HTTP_400_BAD_REQUEST)
+
+        chain = get_reviewer_chain()
+        response = self.check_reviewer(user, chain)
+        if isinstance(response, Response):
+            return response
 
-        approvals = ApprovalModel.objects.all()
-        for approval in approvals :
-            if approval.status == 'approve' :
-                continue
-            approval.reviewer = first
-            approval.save()
+        with transaction.atomic():
+            # 一次查询锁定并校验所有推送，避免校验后被其他请求修改
+            approvals = list(
+                ApprovalModel.objects.select_for_update().filter(id__in=ids)
+                .select_related('sender').only('id', 'link', 'status', 'reviewer', 'sender__email')
+            )
+            found = {approval.id for approval in approvals}
+            missing = [str(approval_id) for approval_id in ids if approval_id not in found]
+            if missing:
+                return Response({'error':f"id={'、'.join(missing)}的推送审核不存在"}, status=status.HTTP_400_BAD_REQUEST)
+            response = self.check_approvals(user, approvals)
+            if isinstance(response, Response):
+                return response
+            self.apply(request, user, chain, approvals)
+
+        return Response({'message':'操作成功', 'count': len(approvals)}, status=status.HTTP_200_OK)
+
+    def check_reviewer(self, user, chain):
+        return None
+
+    def check_approvals(self, user, approvals):
+        "检查推送均由当前用户审核且尚未通过"
+        not_permitted = [str(approval.id) for approval in approvals if not check_reviewer(approval.reviewer_id, user.id)]
+        if not_permitted:
+            return Response({'error':f"您无权操作id={'、'.join(not_permitted)}的推送"}, status=status.HTTP_400_BAD_REQUEST)
+        approved = [str(approval.id) for approval in approvals if approval.status == 'approve']
+        if approved:
+            return Response({'error':f"id={'、'.join(approved)}的推送审核已通过，无法操作"}, status=status.HTTP_400_BAD_REQUEST)
+        return None
+
+    def notify_senders(self, approvals, subject : str, content):
+        "同一送审人的多篇推送合并为一封邮件"
+        links = {}
+        for approval in approvals:
+            links.setdefault(approval.sender.email, []).append(approval.link)
+        for email, sender_links in links.items():
+            send_email(subject=subject, content=content(sender_links), receipient_list=[email])
+
+    def publish(self, approvals, event : str, recipient, **changes):
+        for approval in approvals:
+            data = {'id': approval.id, 'status': approval.status, 'reviewer': approval.reviewer_id, **changes}
+            publish_events([recipient(approval)], event, data)
+
+class BatchPassDownApprovalView(BatchApprovalView):
+    "批量审核通过，向下传递"
+    def check_reviewer(self, user, chain):
+        if user.id not in chain.positions:
+            return Response({'error':'您不在审核流程中，无法传递给下一个审核人'}, status=status.HTTP_400_BAD_REQUEST)
+        if chain.next_of(user.id) is None:
+            return Response({'error':'您已是最后一个审核人，无法传递给下一个审核人'}, status=status.HTTP_400_BAD_REQUEST)
+        return None
 
-        return Response({'message':'创建成功'}, status=status.HTTP_200_OK)
+    def apply(self, request, user, chain, approvals):
+        next_reviewer_id, next_reviewer_email = chain.next_of(user.id)
+        ApprovalModel.objects.filter(id__in=[approval.id for approval in approvals]).update(reviewer_id=next_reviewer_id, message='')
+        send_email(
+            subject="您有新的待审核的推送",
+            content=f"您有{len(approvals)}篇新的待审核的推送，请登录{self.FRONTEND_URL}查看",
+            receipient_list=[next_reviewer_email]
+        )
+        self.publish(approvals, 'approval_review', lambda approval: next_reviewer_id, reviewer=next_reviewer_id)
+
+class BatchRejectApprovalView(BatchApprovalView):
+    "批量审核不通过，打回修改"
+    def apply(self, request, user, chain, approvals):
+        message = request.data.get('message')
+        ApprovalModel.objects.filter(id__in=[approval.id for approval in approvals]).update(status='reject', message=message)
+        self.notify_senders(
+            approvals,
+            subject="您的推送已被拒绝",
+            content=lambda links: f"您的推送 : {'、'.join(links)} 已被拒绝，请登录{self.FRONTEND_URL}查看具体情况",
+        )
+        self.publish(approvals, 'approval_status', lambda approval: approval.sender_id, status='reject')
 
-class QueryReviewerView(ListAPIView):
-    pagination_class = CustomPagination
-    queryset = ApprovalManageModel.objects.all().order_by('order')
-    serializer_class = ReviewerSerializer
\ No newline at end of file
+class BatchApproveApprovalView(BatchApprovalView):
+    "批量审核最终通过，允许发表"
+    def check_reviewer(self, user, chain):
+        final_reviewer = chain.last()
+        if final_reviewer is None or not check_reviewer(final_reviewer[0], user.id):
+            return Response({'error':'无权操作'}, status=status.HTTP_400_BAD_REQUEST)
+        return None
+
+    def check_approvals(self, user, approvals):
+        "最终审核人可以直接通过任意推送，已通过的推送不重复处理"
+        approved = [str(approval.id) for approval in approvals if approval.status == 'approve']
+        if approved:
+            return Response({'error':f"id={'、'.join(approved)}的推送审核已通过，无法操作"}, status=status.HTTP_400_BAD_REQUEST)
+        return None
+
+    def apply(self, request, user, chain, approvals):
+        ApprovalModel.objects.filter(id__in=[approval.id for approval in approvals]).update(status='approve', message='')
+        self.notify_senders(
+            approvals,
+            subject="您的推送审核已通过",
+            content=lambda links: f"您的推送 - {'、'.join(links)} - 审核已通过！",
+        )
+        self.publish(approvals, 'approval_status', lambda approval: approval.sender_id, status='approve')
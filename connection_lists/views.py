@@ -10,6 +10,7 @@ from utils.get import get_detachment_name, get_leader, get_theme, get_duration,
 from .serializers import ConnectionListSerializer
 from .models import ConnectionListModel, FileModel
 from utils.pagination import CustomPagination
+from utils.cache import CachedResponseMixin
 import os
 import base64
 
@@ -65,7 +66,8 @@ class UploadConnectionListView(APIView):
 
         return Response({'message':'上传成功'}, status=status.HTTP_200_OK)
     
-class QueryConnectionListView(ListAPIView):
+class QueryConnectionListView(CachedResponseMixin, ListAPIView):
+    cache_models = (ConnectionListModel,)
     queryset = ConnectionListModel.objects.all().order_by("id")
     serializer_class = ConnectionListSerializer
     pagination_class = CustomPagination
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Detachment
+from django.db.models import Prefetch
+from .models import Detachment, DetachmentMembership
 
 class DetachmentSerializer(serializers.ModelSerializer):
     detachment_leader = serializers.SerializerMethodField()
@@ -17,10 +18,21 @@ class DetachmentSerializer(serializers.ModelSerializer):
             'detachment_member'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """ 一次查询预取所有支队的成员及用户名，序列化时不再逐个支队查询 """
+        # 按用户主键倒序，与 CustomUser 的默认排序一致
+        memberships = DetachmentMembership.objects.select_related('user').only(
+            'detachment', 'role', 'user', 'user__username'
+        ).order_by('-user_id')
+        return queryset.prefetch_related(Prefetch('detachmentmembership_set', queryset=memberships))
+
     def get_detachment_leader(self, obj):
-        leaders = obj.get_leaders()
-        return list(leaders.values_list('username', flat=True))
+        return self.get_usernames(obj, 'leader')
 
     def get_detachment_member(self, obj):
-        members = obj.get_members()
-        return list(members.values_list('username', flat=True))
\ No newline at end of file
+        return self.get_usernames(obj, 'member')
+
+    def get_usernames(self, obj, role):
+        """ 在预取的成员关系中按角色筛选用户名，queryset 需经过 setup_eager_loading 处理 """
+        return [membership.user.username for membership in obj.detachmentmembership_set.all() if membership.role == role]
@@ -0,0 +1,4 @@
+from .models import Detachment, DetachmentMembership
+from utils.pagination import track_count
+
+track_count(Detachment, DetachmentMembership)
@@ -6,6 +6,14 @@ from users.models import CustomUser
 from .models import Detachment, DetachmentMembership
 from rest_framework_simplejwt.tokens import RefreshToken
 from utils.test import create_detachment, create_normal_user, create_super_administrator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from io import BytesIO
+import pandas as pd
+from django.core.cache import cache
+from unittest.mock import patch, PropertyMock
+from utils.cache import get_response_version_key
 
 class CreateDetachmentViewTests(TestCase):
     def setUp(self):
@@ -118,6 +126,34 @@ class CreateDetachmentViewTests(TestCase):
         response = self.client.post(self.url, {**test_data, 'detachment_member':['Mr. Nobody']}, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_report_all_missing_users(self):
+        " 测试一次性报告所有不存在的用户 "
+        response = self.client.post(self.url, {**self.test_data, 'detachment_member':['member_1', 'nobody_1', 'nobody_2']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('nobody_1', response.data['error'])
+        self.assertIn('nobody_2', response.data['error'])
+
+    def test_leader_and_member_conflict(self):
+        " 测试同一用户不能同时是支队长和支队员 "
+        response = self.client.post(self.url, {**self.test_data, 'detachment_member':['leader_1']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_constant_query_count(self):
+        " 测试查询次数与支队人数无关 "
+        self.client.post(self.url, self.test_data, format='json')
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(self.url, self.test_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        create_normal_user([f'member_{i}' for i in range(3, 20)])
+        test_data = {**self.test_data, 'detachment_member':[f'member_{i}' for i in range(1, 20)]}
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(self.url, test_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        detachment = Detachment.objects.order_by('-id').first()
+        self.assertEqual(detachment.get_members().count(), 19)
+        self.assertEqual(detachment.get_leaders().count(), 2)
+
 class ModifyDetachmentViewTests(TestCase):
     def setUp(self) -> None:
         " 测试设置 "
@@ -296,4 +332,117 @@ class GetDetachmentViewTests(TestCase):
         response = self.client.get(self.get_all_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 10)  # 默认分页大小
-        self.assertIsNotNone(response.data['next'])
\ No newline at end of file
+        self.assertIsNotNone(response.data['next'])
+
+    def test_leaders_and_members(self):
+        """测试列表中的支队长和支队员"""
+        create_normal_user(['leader_1', 'member_1', 'member_2'])
+        detachment = create_detachment(['leader_1'], ['member_1', 'member_2'])
+        response = self.client.get(self.get_valid_url)
+        result = next(item for item in response.data['results'] if item['id'] == detachment.id)
+        self.assertEqual(result['detachment_leader'], ['leader_1'])
+        self.assertEqual(result['detachment_member'], ['member_2', 'member_1'])
+
+    def test_constant_query_count(self):
+        """测试每页的查询次数与支队数量无关"""
+        create_normal_user(['leader_1', 'member_1'])
+        for i in range(8):
+            create_detachment(['leader_1'], ['member_1'])
+        # 计数、分页、预取成员各一次查询
+        with self.assertNumQueries(3):
+            response = self.client.get(self.get_all_url)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_cached_response(self):
+        """测试有效支队列表的响应缓存、ETag 及写入后失效"""
+        response = self.client.get(self.get_valid_url)
+        etag = response['ETag']
+        # 缓存命中时不查询数据库
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.get_valid_url)
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.json(), response.json())
+        self.assertEqual(cached['ETag'], etag)
+        response = self.client.get(self.get_valid_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        detachment = create_detachment([], [])
+        response = self.client.get(self.get_valid_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(detachment.id, [item['id'] for item in response.json()['results']])
+
+    def test_invalidation_without_scan(self):
+        """测试写入只更新视图版本号，不扫描Redis键空间"""
+        self.client.get(self.get_valid_url)
+        with patch.object(cache, 'delete_pattern') as delete_pattern:
+            create_detachment([], [])
+        delete_pattern.assert_not_called()
+        self.assertIsNotNone(cache.get(get_response_version_key('GetValidDetachment')))
+
+class ImportDetachmentViewTests(TestCase):
+    def setUp(self) -> None:
+        " 测试设置 "
+        self.client = APIClient()
+        self.url = reverse('import-detachment')
+        self.super_administrator = create_super_administrator()
+        create_normal_user(['leader_1', 'leader_2', 'member_1', 'member_2'])
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.super_administrator).access_token)
+        self.rows = [
+            ['支队一', '2025-07-01', '2025-07-10', 'leader_1', 'member_1、member_2'],
+            ['支队二', '2025-07-02', '2025-07-12', 'leader_2', ''],
+        ]
+
+    def build_excel(self, rows):
+        output = BytesIO()
+        pd.DataFrame(rows, columns=['支队名称', '开始日期', '结束日期', '支队长', '支队员']).to_excel(output, index=False)
+        return SimpleUploadedFile('detachments.xlsx', output.getvalue())
+
+    def test_import_excel(self):
+        " 测试导入Excel表格 "
+        response = self.client.post(self.url, {'file': self.build_excel(self.rows)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Detachment.objects.count(), 2)
+        detachment = Detachment.objects.get(name='支队一')
+        self.assertEqual(list(detachment.get_leaders().values_list('username', flat=True)), ['leader_1'])
+        self.assertEqual(detachment.get_members().count(), 2)
+
+    def test_import_without_bulk_returning(self):
+        " 测试逐条插入支队（如MySQL）时导入结束后只使缓存失效一次 "
+        with patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', new_callable=PropertyMock, return_value=False), \
+                patch('utils.cache.bump_response_versions') as bump_response_versions, \
+                patch('utils.pagination.invalidate_count_cache') as invalidate_count_cache, \
+                patch('detachments.views.invalidate_count_cache') as invalidate_after_import:
+            response = self.client.post(self.url, {'file': self.build_excel(self.rows)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Detachment.objects.count(), 2)
+        self.assertEqual(bump_response_versions.call_count, 1)
+        invalidate_count_cache.assert_not_called()
+        invalidate_after_import.assert_called_once()
+
+    def test_import_csv(self):
+        " 测试导入CSV表格 "
+        content = '支队名称,开始日期,结束日期,支队长,支队员\n支队一,2025-07-01,2025-07-10,leader_1,member_1 member_2\n'
+        file = SimpleUploadedFile('detachments.csv', content.encode('utf-8'))
+        response = self.client.post(self.url, {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(DetachmentMembership.objects.count(), 3)
+
+    def test_row_errors(self):
+        " 测试逐行报告错误且不导入任何支队 "
+        rows = self.rows + [['支队三', 'wrong_date', '2025-07-12', 'leader_1', ''], ['支队四', '2025-07-02', '2025-07-12', 'nobody', '']]
+        response = self.client.post(self.url, {'file': self.build_excel(rows)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5])
+        self.assertEqual(Detachment.objects.count(), 0)
+
+    def test_wrong_columns(self):
+        " 测试表头不正确 "
+        file = SimpleUploadedFile('detachments.csv', '名称,日期\n支队一,2025-07-01\n'.encode('utf-8'))
+        response = self.client.post(self.url, {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_wrong_permission(self):
+        " 测试用户权限不足 "
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(CustomUser.objects.get(username='leader_1')).access_token)
+        response = self.client.post(self.url, {'file': self.build_excel(self.rows)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import CreateDetachmentView, ModifyDetachmentView, DeactivateDetachmentView, DeleteDetachmentView, GetAllDetachmentView, GetValidDetachment
+from .views import CreateDetachmentView, ModifyDetachmentView, DeactivateDetachmentView, DeleteDetachmentView, GetAllDetachmentView, GetValidDetachment, ImportDetachmentView
 
 urlpatterns = [
     path('create/', CreateDetachmentView.as_view(), name='create'),
@@ -8,4 +8,5 @@ urlpatterns = [
     path('delete/', DeleteDetachmentView.as_view(), name='delete'),
     path('get-all/', GetAllDetachmentView.as_view(), name='get-all'),
     path('get-valid/', GetValidDetachment.as_view(), name='get-valid'),
+    path('import/', ImportDetachmentView.as_view(), name='import-detachment'),
 ]
\ No newline at end of file
@@ -2,16 +2,30 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework import status
 from rest_framework.response import Response
-from users.models import CustomUser
 from .models import Detachment, DetachmentMembership
 from .serializers import DetachmentSerializer
-from utils.check import check_detachment_leader_input, check_detachment_member_input, check_detachment_leader, check_user_permission
-from utils.get import transform_date
-from utils.pagination import CustomPagination
+from utils.check import check_excel, check_detachment_input, check_username_format, check_usernames_exist, check_detachment_leader_from_request, check_administrator_from_request
+from utils.get import transform_date, get_user_id_map
+from utils.pagination import CustomPagination, invalidate_count_cache
+from utils.cache import CachedResponseMixin, invalidate_response_cache, suspend_invalidation
 from django.shortcuts import get_object_or_404
+from django.db import transaction, connection
+import os
+import re
+import pandas as pd
 
 not_permitted = "用户权限不足"
 
+IMPORT_COLUMNS = ['支队名称', '开始日期', '结束日期', '支队长', '支队员']
+IMPORT_BATCH_SIZE = 200
+
+def build_memberships(detachment : Detachment, usernames : list[str], user_map : dict, role : str) -> list[DetachmentMembership] :
+    " 根据用户名到主键的映射构造支队成员关系，重复的用户名只保留一个 "
+    return [
+        DetachmentMembership(user_id = user_map[username], detachment = detachment, role = role)
+        for username in dict.fromkeys(usernames)
+    ]
+
 # Create your views here.
 class CreateDetachmentView(APIView) :
     def post(self, request) :
@@ -22,8 +36,7 @@ class CreateDetachmentView(APIView) :
         detachment_leader = data.get("detachment_leader")
         detachment_member = data.get("detachment_member")
 
-        access_token = request.COOKIES.get('access_token')
-        if not check_user_permission(access_token) :
+        if not check_administrator_from_request(request) :
             return Response({'error':not_permitted}, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -38,35 +51,23 @@ class CreateDetachmentView(APIView) :
         if end_date is None :
             return Response({'error':'结束日期格式不合法'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if isinstance(check_detachment_leader_input(detachment_leader), Response) :
-            return check_detachment_leader_input(detachment_leader)
-        
-        if isinstance(check_detachment_member_input(detachment_member), Response) :
-            return check_detachment_member_input(detachment_member)
-        
-        detachment = Detachment.objects.create(
-            name = name,
-            start_date = start_date,
-            end_date = end_date
-        )
-
-        for username in detachment_leader :
-            user = CustomUser.objects.get(username=username)
-            DetachmentMembership.objects.create(
-                user = user,
-                detachment = detachment,
-                role = 'leader'
-            )
+        user_map = check_detachment_input(detachment_leader, detachment_member)
+        if isinstance(user_map, Response) :
+            return user_map
 
-        for username in detachment_member :
-            user = CustomUser.objects.get(username=username)
-            DetachmentMembership.objects.create(
-                user = user,
-                detachment = detachment,
-                role = 'member'
+        with transaction.atomic() :
+            detachment = Detachment.objects.create(
+                name = name,
+                start_date = start_date,
+                end_date = end_date
+            )
+            DetachmentMembership.objects.bulk_create(
+                build_memberships(detachment, detachment_leader, user_map, 'leader') +
+                build_memberships(detachment, detachment_member, user_map, 'member')
             )
+        invalidate_count_cache(DetachmentMembership)
+        invalidate_response_cache(DetachmentMembership)
 
-        detachment.save()
         return Response({'message':'创建支队成功'}, status=status.HTTP_200_OK)
 
 class ModifyDetachmentView(APIView) :
@@ -80,8 +81,7 @@ class ModifyDetachmentView(APIView) :
 
         detachment = get_object_or_404(Detachment, id=key)
 
-        access_token = request.COOKIES.get('access_token')
-        if not check_user_permission(access_token) and not check_detachment_leader(access_token, key) :
+        if not check_administrator_from_request(request) and not check_detachment_leader_from_request(request, key) :
             return Response({"error":"用户无权修改支队信息"}, status=status.HTTP_400_BAD_REQUEST)
 
         if isinstance(name, str) and len(name) >  100 :
@@ -97,23 +97,27 @@ class ModifyDetachmentView(APIView) :
             if end_date is None :
                 return Response({'error':'结束日期格式不合法'}, status=status.HTTP_400_BAD_REQUEST)
 
-        response = self.check_member(detachment_member)
-        if isinstance(response, Response) :
-            return response
-        return detachment
+        user_map = self.check_member(detachment_member)
+        if isinstance(user_map, Response) :
+            return user_map
+        return detachment, user_map
     
     def check_member(self, detachment_member):
+        " 检查支队员列表，合法时返回用户名到用户主键的映射 "
         if not isinstance(detachment_member, list) :
             return Response({'error':'支队员信息不合法'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if len(detachment_member) > 0:
-            for i in detachment_member :
-                if not isinstance(i, str) or len(i) > 100 :
-                    return Response({'error':'输入格式非法'}, status=status.HTTP_400_BAD_REQUEST)
-                if not CustomUser.objects.filter(username = i).exists() :
-                    return Response({'error':f"用户 {i} 不存在"}, status=status.HTTP_400_BAD_REQUEST)
-                
-        return None
+        if not check_username_format(detachment_member) :
+            return Response({'error':'输入格式非法'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(detachment_member) == 0 :
+            return {}
+
+        user_map = get_user_id_map(detachment_member)
+        response = check_usernames_exist(detachment_member, user_map)
+        if response is not None :
+            return response
+        return user_map
         
     def post(self, request) :
         data = request.data
@@ -122,9 +126,10 @@ class ModifyDetachmentView(APIView) :
         end_date_str = data.get("end_date")
         detachment_member = data.get("detachment_member")
 
-        detachment = self.valid_data(request)
-        if isinstance(detachment, Response):
-            return detachment
+        result = self.valid_data(request)
+        if isinstance(result, Response):
+            return result
+        detachment, user_map = result
         start_date = transform_date(start_date_str)
         end_date = transform_date(end_date_str)
         
@@ -137,17 +142,15 @@ class ModifyDetachmentView(APIView) :
         if end_date_str is not None :
             detachment.end_date = end_date
 
-        if len(detachment_member) > 0 :
-            DetachmentMembership.objects.filter(detachment = detachment, role='member').delete()
-            for username in detachment_member :
-                user = CustomUser.objects.get(username=username)
-                DetachmentMembership.objects.create(
-                    user = user,
-                    detachment = detachment,
-                    role = 'member'
+        with transaction.atomic() :
+            if len(detachment_member) > 0 :
+                DetachmentMembership.objects.filter(detachment = detachment, role='member').delete()
+                DetachmentMembership.objects.bulk_create(
+                    build_memberships(detachment, detachment_member, user_map, 'member')
                 )
-        
-        detachment.save()
+                invalidate_count_cache(DetachmentMembership)
+                invalidate_response_cache(DetachmentMembership)
+            detachment.save()
 
         return Response({'message':'成功修改支队信息'}, status=status.HTTP_200_OK)
     
@@ -163,8 +166,7 @@ class DeactivateDetachmentView(APIView) :
         except Detachment.DoesNotExist :
             return Response({"error":"支队不存在"}, status=status.HTTP_400_BAD_REQUEST)
 
-        access_token = request.COOKIES.get("access_token")
-        if not check_user_permission(access_token) :
+        if not check_administrator_from_request(request) :
             return Response({'error':not_permitted}, status=status.HTTP_400_BAD_REQUEST)
 
         detachment.valid = False
@@ -176,8 +178,7 @@ class DeleteDetachmentView(APIView):
         data = request.data
         primary_key = data.get('id')
 
-        access_token = request.COOKIES.get('access_token')
-        if not check_user_permission(access_token) :
+        if not check_administrator_from_request(request) :
             return Response({'error':not_permitted}, status=status.HTTP_400_BAD_REQUEST)
         
         detachment = Detachment.objects.filter(id=primary_key).first()
@@ -187,11 +188,121 @@ class DeleteDetachmentView(APIView):
         return Response({'message': '成功删除支队'}, status=status.HTTP_200_OK)
     
 class GetAllDetachmentView(ListAPIView):
-    queryset = Detachment.objects.all()
+    queryset = DetachmentSerializer.setup_eager_loading(Detachment.objects.all())
     serializer_class = DetachmentSerializer
     pagination_class = CustomPagination
 
-class GetValidDetachment(ListAPIView):
-    queryset = Detachment.objects.filter(valid=True)
+class GetValidDetachment(CachedResponseMixin, ListAPIView):
+    cache_models = (Detachment, DetachmentMembership)
+    queryset = DetachmentSerializer.setup_eager_loading(Detachment.objects.filter(valid=True))
     serializer_class = DetachmentSerializer
-    pagination_class = CustomPagination
\ No newline at end of file
+    pagination_class = CustomPagination
+
+class ImportDetachmentView(APIView):
+    "通过表格批量导入支队"
+    def post(self, request):
+        if not check_administrator_from_request(request):
+            return Response({'error':not_permitted}, status=status.HTTP_400_BAD_REQUEST)
+
+        file = request.FILES.get('file')
+        if file is None :
+            return Response({'error':'文件不存在'}, status=status.HTTP_400_BAD_REQUEST)
+
+        df = self.read_table(file)
+        if isinstance(df, Response):
+            return df
+
+        rows = [self.parse_row(row) for _, row in df.iterrows()]
+        # 一次查询获取表格中所有用户
+        user_map = get_user_id_map(name for row in rows for name in row['leaders'] + row['members'])
+
+        errors = []
+        for index, row in enumerate(rows):
+            error = self.check_row(row, user_map)
+            if error is not None:
+                # 表头占第一行，数据从第二行开始
+                errors.append({'row': index + 2, 'error': error})
+        if errors:
+            return Response({'error':'表格中存在错误，未导入任何支队', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+                batch = rows[start:start + IMPORT_BATCH_SIZE]
+                detachments = [
+                    Detachment(name=row['name'], start_date=row['start_date'], end_date=row['end_date'])
+                    for row in batch
+                ]
+                self.create_detachments(detachments)
+                memberships = []
+                for detachment, row in zip(detachments, batch):
+                    memberships += build_memberships(detachment, row['leaders'], user_map, 'leader')
+                    memberships += build_memberships(detachment, row['members'], user_map, 'member')
+                DetachmentMembership.objects.bulk_create(memberships)
+        invalidate_count_cache(Detachment, DetachmentMembership)
+        invalidate_response_cache(Detachment, DetachmentMembership)
+
+        return Response({'message':'导入成功', 'count': len(rows)}, status=status.HTTP_200_OK)
+
+    def read_table(self, file):
+        " 读取CSV或Excel表格并检查表头 "
+        file_extension = os.path.splitext(file.name)[1].lower()
+        try :
+            if file_extension == '.csv':
+                df = pd.read_csv(file, dtype=str)
+            elif check_excel(file_extension):
+                df = pd.read_excel(file, dtype=str)
+            else :
+                return Response({'error':'传入的文件不是CSV或Excel表格'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception :
+            return Response({'error':'无法读取表格'}, status=status.HTTP_400_BAD_REQUEST)
+        df.columns = [str(column).strip() for column in df.columns]
+        if any(column not in df.columns for column in IMPORT_COLUMNS):
+            return Response({'error':f"表格必须包含以下列：{'、'.join(IMPORT_COLUMNS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        return df.fillna('')
+
+    def parse_row(self, row) -> dict :
+        " 解析表格中的一行，支队长和支队员之间可用逗号、顿号、分号或空白分隔 "
+        return {
+            'name': str(row['支队名称']).strip(),
+            'start_date': self.parse_date(row['开始日期']),
+            'end_date': self.parse_date(row['结束日期']),
+            'leaders': [name for name in re.split(r'[,，、;；\s]+', str(row['支队长'])) if name],
+            'members': [name for name in re.split(r'[,，、;；\s]+', str(row['支队员'])) if name],
+        }
+
+    def parse_date(self, value):
+        date = pd.to_datetime(str(value).strip(), errors='coerce')
+        return None if pd.isna(date) else date.date()
+
+    def check_row(self, row : dict, user_map : dict) -> str | None :
+        " 检查一行数据，返回错误信息 "
+        if len(row['name']) == 0 or len(row['name']) > 100 :
+            return '支队名不合法'
+        if row['start_date'] is None :
+            return '开始日期格式不合法'
+        if row['end_date'] is None :
+            return '结束日期格式不合法'
+        if len(row['leaders']) == 0 :
+            return '支队长不能为空'
+        if any(len(name) > 100 for name in row['leaders'] + row['members']) :
+            return '输入格式非法'
+        leader_set = set(row['leaders'])
+        duplicated = [name for name in dict.fromkeys(row['members']) if name in leader_set]
+        if duplicated :
+            return f"用户 {'、'.join(duplicated)} 不能同时是支队长和支队员"
+        missing = [name for name in dict.fromkeys(row['leaders'] + row['members']) if name not in user_map]
+        if missing :
+            return f"用户 {'、'.join(missing)} 不存在"
+        return None
+
+    def create_detachments(self, detachments : list[Detachment]) :
+        """
+        批量插入支队；数据库不支持批量插入返回主键时（如MySQL）逐条插入。
+        逐条插入时不触发缓存失效，由调用方在导入结束后统一处理。
+        """
+        if connection.features.can_return_rows_from_bulk_insert:
+            Detachment.objects.bulk_create(detachments)
+        else :
+            with suspend_invalidation():
+                for detachment in detachments:
+                    detachment.save()
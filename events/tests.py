@@ -0,0 +1,101 @@
+from django.test import TestCase
+from django.urls import reverse
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from approvals.models import ApprovalModel
+from events.views import POLL_INTERVAL
+from utils.events import get_event_stream_key, publish_events
+from utils.test import create_detachment, create_normal_user, create_notice
+import json
+
+class PublishEventTests(TestCase):
+    def setUp(self):
+        self.sender, self.reviewer, self.next_reviewer = create_normal_user(['sender', 'reviewer', 'next_reviewer'])
+        self.connection = get_redis_connection('default')
+        self.connection.delete(*[get_event_stream_key(user.id) for user in (self.sender, self.reviewer, self.next_reviewer)])
+        self.last_ids = {}
+
+    def receive(self, user):
+        "读取用户上次读取之后的第一条事件"
+        entries = self.connection.xrange(get_event_stream_key(user.id), min=self.last_ids.get(user.id, '-'), count=2)
+        entries = [entry for entry in entries if entry[0] != self.last_ids.get(user.id)]
+        if not entries:
+            return None
+        event_id, fields = entries[0]
+        self.last_ids[user.id] = event_id
+        return {'event': fields[b'event'].decode(), 'data': json.loads(fields[b'data'])}
+
+    def test_new_notice_event(self):
+        """测试新通知推送给队长"""
+        detachment = create_detachment(['sender'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            notice = create_notice(detachments=[detachment])
+        self.assertEqual(self.receive(self.sender), {'event': 'notice', 'data': {'id': notice.id}})
+
+    def test_approval_events(self):
+        """测试推送审核的审核人及状态变化"""
+        approval = ApprovalModel.objects.create(sender=self.sender, sender_name='sender', link='link', reviewer=self.reviewer)
+        approval = ApprovalModel.objects.get(id=approval.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            approval.reviewer = self.next_reviewer
+            approval.save()
+        event = self.receive(self.next_reviewer)
+        self.assertEqual(event['event'], 'approval_review')
+        self.assertEqual(event['data']['id'], approval.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            approval.status = 'reject'
+            approval.save()
+        event = self.receive(self.sender)
+        self.assertEqual(event['event'], 'approval_status')
+        self.assertEqual(event['data']['status'], 'reject')
+        # 状态和审核人未变化时不推送
+        with self.captureOnCommitCallbacks(execute=True):
+            approval.message = '修改意见'
+            approval.save()
+        self.assertIsNone(self.receive(self.sender))
+        self.assertIsNone(self.receive(self.next_reviewer))
+
+class EventPollViewTests(TestCase):
+    def setUp(self):
+        self.user = create_normal_user('poller')
+        get_redis_connection('default').delete(get_event_stream_key(self.user.id))
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_unauthenticated(self):
+        """测试用户未登录"""
+        response = APIClient().get(reverse('event-poll'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_receive_events(self):
+        """测试按游标取出登录用户的事件"""
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_events([self.user.id], 'notice', {'id': 1})
+            publish_events([self.user.id], 'notice', {'id': 2})
+        response = self.client.get(reverse('event-poll'), {'last_id': '0-0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['data'] for event in response.data['events']], [{'id': 1}, {'id': 2}])
+        self.assertEqual(response.data['last_id'], response.data['events'][-1]['id'])
+
+        # 从上次的游标继续读取，只返回新事件
+        last_id = response.data['last_id']
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_events([self.user.id], 'approval_status', {'id': 3, 'status': 'pass'})
+        response = self.client.get(reverse('event-poll'), {'last_id': last_id})
+        self.assertEqual([event['event'] for event in response.data['events']], ['approval_status'])
+
+    def test_no_new_events(self):
+        """测试没有新事件时立即返回空列表"""
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_events([self.user.id], 'notice', {'id': 1})
+        response = self.client.get(reverse('event-poll'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['events'], [])
+        self.assertEqual(response.data['interval'], POLL_INTERVAL)
+        self.assertEqual(response.data['last_id'], get_redis_connection('default').xrevrange(get_event_stream_key(self.user.id), count=1)[0][0].decode())
+
+    def test_invalid_last_id(self):
+        response = self.client.get(reverse('event-poll'), {'last_id': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
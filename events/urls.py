@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import EventPollView
+
+urlpatterns = [
+    path('poll/', EventPollView.as_view(), name='event-poll'),
+]
@@ -0,0 +1,26 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from redis.exceptions import ResponseError
+from utils.events import get_latest_event_id, read_events
+from utils.get import get_user_from_request
+
+# 建议客户端的轮询间隔（秒）
+POLL_INTERVAL = 10
+
+class EventPollView(APIView):
+    """
+    获取新通知及审核状态变化，客户端按 interval 定时轮询，无需轮询各列表。
+    读取不阻塞，不会长时间占用 uWSGI 的同步工作线程。
+    传入上次返回的 last_id 继续读取，不传时只返回当前最新事件的游标。
+    """
+    def get(self, request):
+        user = get_user_from_request(request)
+        if isinstance(user, Response):
+            return user
+        last_id = request.query_params.get('last_id') or get_latest_event_id(user.id)
+        try:
+            events, last_id = read_events(user.id, last_id)
+        except ResponseError:
+            return Response({"error": "last_id格式非法"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"events": events, "last_id": last_id, "interval": POLL_INTERVAL}, status=status.HTTP_200_OK)
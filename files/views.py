@@ -10,6 +10,7 @@ from django.http import FileResponse
 from utils.get import get_user_from_request
 from utils.check import check_administrator_from_request
 from utils.pagination import CustomPagination
+from utils.cache import CachedResponseMixin
 import base64
 from datetime import datetime
 
@@ -89,8 +90,9 @@ class UploadLetterView(APIView):
         return Response({'message':'上传成功'}, status=status.HTTP_200_OK)
 
 
-class GetTemplateView(ListAPIView):
+class GetTemplateView(CachedResponseMixin, ListAPIView):
     "查询所有的模板"
+    cache_models = (LetterFileModel,)
     pagination_class = CustomPagination
     serializer_class = TemplateSerializer
     queryset = LetterFileModel.objects.filter(template=True).order_by("id")
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from utils.check import check_administrator_from_request
 from utils.get import get_user_from_request
+from utils.cache import CachedResponseMixin
 from utils.feishu import create_feishu_document, add_coauthor, delete_feishu_document
 from .models import Handbook
 from .serializers import HandbookSerializer
@@ -12,7 +13,10 @@ not_permitted = "用户权限不足"
 handbook_miss = "文档不存在"
 # Create your views here.
 
-class GetLinkView(APIView):
+class GetLinkView(CachedResponseMixin, APIView):
+    cache_models = (Handbook,)
+    cache_login_required = True
+
     def get(self, request):
         user = get_user_from_request(request)
         if isinstance(user, Response):
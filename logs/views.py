@@ -7,7 +7,7 @@ from django.shortcuts import get_object_or_404
 from utils.get import get_illegal_response, get_user_from_request, transform_date
 from utils.check import check_in_detachment, check_administrator_from_request
 from .models import LogModel
-from utils.pagination import CustomPagination
+from utils.pagination import CachedCountPagination
 from .serializers import DetachmentWithLogsSerializer
 import datetime
 
@@ -94,7 +94,7 @@ class WriteLogView(APIView):
 
 
 class QueryLogView(ListAPIView) :
-    pagination_class = CustomPagination
+    pagination_class = CachedCountPagination
     serializer_class = DetachmentWithLogsSerializer
 
     def get(self, request, *args, **kwargs):
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from mails.outbox import process_outbox
+from utils.send import MAIL_CHUNK_SIZE
+import time
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox with retry and backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='发送一批到期的邮件后退出')
+        parser.add_argument('--batch-size', type=int, default=MAIL_CHUNK_SIZE, help='每批领取的邮件数，每批复用一个SMTP连接')
+        parser.add_argument('--interval', type=float, default=5, help='发件箱为空时的轮询间隔（秒）')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent, failed = process_outbox(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'发送成功 {sent} 封，失败 {failed} 封')
+            if options['once']:
+                break
+            # 本批领满时说明可能还有积压，立即处理下一批
+            if sent + failed < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+from django.db import models
+from django.utils import timezone
+
+# Create your models here.
+class OutboxMail(models.Model):
+    "待发送邮件，请求中只写入此表，由 send_outbox 命令在后台发送"
+    MAIL_STATUS = [
+        ('pending', '待发送'),
+        ('sending', '发送中'),
+        ('sent', '已发送'),
+        ('failed', '发送失败'),
+    ]
+
+    subject = models.CharField(max_length=200) # 邮件标题
+    content = models.TextField() # 邮件正文
+    recipients = models.JSONField(default=list) # 收件人邮箱列表
+    status = models.CharField(max_length=10, choices=MAIL_STATUS, default='pending') # 发送状态
+    attempts = models.IntegerField(default=0) # 已尝试发送次数
+    next_attempt_at = models.DateTimeField(default=timezone.now) # 下次可发送的时间
+    last_error = models.TextField(blank=True, default='') # 最近一次发送失败的原因
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True, default=None)
+
+    def __str__(self) -> str:
+        return self.subject
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
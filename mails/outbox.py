@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from datetime import timedelta
+from .models import OutboxMail
+from utils.send import send_messages_in_chunks, MAIL_CHUNK_SIZE
+
+# 发送失败后的重试间隔按 RETRY_BASE_DELAY * 2^(次数-1) 增长，最长 RETRY_MAX_DELAY
+MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = timedelta(seconds=30)
+RETRY_MAX_DELAY = timedelta(hours=1)
+# 领取邮件后若在此时间内未完成发送（如进程被杀死），邮件可被重新领取
+SENDING_LEASE = timedelta(minutes=5)
+
+def get_retry_delay(attempts : int) -> timedelta :
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+def claim_mails(batch_size : int) -> list :
+    "领取一批到期的邮件，多个发送进程同时运行时跳过已被锁定的行"
+    now = timezone.now()
+    with transaction.atomic():
+        mails = list(
+            OutboxMail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if mails:
+            OutboxMail.objects.filter(id__in=[mail.id for mail in mails]).update(
+                status='sending', next_attempt_at=now + SENDING_LEASE
+            )
+    return mails
+
+def build_message(mail : OutboxMail) -> EmailMessage :
+    return EmailMessage(mail.subject, mail.content, settings.DEFAULT_FROM_EMAIL, mail.recipients)
+
+def record_failure(mail : OutboxMail, error : str) :
+    "记录发送失败，按退避时间安排重试，超过最大次数后不再发送"
+    mail.attempts += 1
+    mail.last_error = error
+    if mail.attempts >= MAX_ATTEMPTS :
+        mail.status = 'failed'
+    else :
+        mail.status = 'pending'
+        mail.next_attempt_at = timezone.now() + get_retry_delay(mail.attempts)
+    mail.save(update_fields=['attempts', 'status', 'next_attempt_at', 'last_error'])
+
+def process_outbox(batch_size : int = MAIL_CHUNK_SIZE) -> tuple[int, int] :
+    "发送一批到期的邮件，返回（成功数，失败数）"
+    mails = claim_mails(batch_size)
+    if not mails:
+        return 0, 0
+    errors = send_messages_in_chunks([build_message(mail) for mail in mails])
+    sent_ids = [mail.id for mail, error in zip(mails, errors) if error is None]
+    OutboxMail.objects.filter(id__in=sent_ids).update(status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1)
+    for mail, error in zip(mails, errors):
+        if error is not None:
+            record_failure(mail, error)
+    return len(sent_ids), len(mails) - len(sent_ids)
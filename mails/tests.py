@@ -0,0 +1,102 @@
+from django.test import TestCase
+from django.core import mail
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import call_command
+from django.utils import timezone
+from unittest.mock import patch
+from io import StringIO
+from .models import OutboxMail
+from .outbox import process_outbox, MAX_ATTEMPTS
+from utils.send import send_email, send_notice_emails, send_messages_in_chunks
+import smtplib
+
+class OutboxTests(TestCase):
+    def test_enqueue_without_sending(self):
+        """测试发送邮件只写入发件箱"""
+        send_email('标题', '内容', ['a@test.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        outbox_mail = OutboxMail.objects.get()
+        self.assertEqual(outbox_mail.status, 'pending')
+        self.assertEqual(outbox_mail.recipients, ['a@test.com'])
+
+    def test_notice_emails_separately(self):
+        """测试公告邮件每位收件人单独一封"""
+        send_notice_emails(['a@test.com', 'b@test.com'], '内容', '标题')
+        self.assertEqual(OutboxMail.objects.count(), 2)
+
+    def test_process_outbox(self):
+        """测试发送到期的邮件"""
+        send_email('标题', '内容', ['a@test.com'])
+        self.assertEqual(process_outbox(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['a@test.com'])
+        outbox_mail = OutboxMail.objects.get()
+        self.assertEqual(outbox_mail.status, 'sent')
+        self.assertIsNotNone(outbox_mail.sent_at)
+        # 已发送的邮件不会重复发送
+        self.assertEqual(process_outbox(), (0, 0))
+
+    @patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('连接超时'))
+    def test_retry_with_backoff(self, mock_send):
+        """测试发送失败后延后重试"""
+        send_email('标题', '内容', ['a@test.com'])
+        self.assertEqual(process_outbox(), (0, 1))
+        outbox_mail = OutboxMail.objects.get()
+        self.assertEqual(outbox_mail.status, 'pending')
+        self.assertEqual(outbox_mail.attempts, 1)
+        self.assertEqual(outbox_mail.last_error, '连接超时')
+        self.assertGreater(outbox_mail.next_attempt_at, timezone.now())
+        # 未到重试时间时不会再次发送
+        self.assertEqual(process_outbox(), (0, 0))
+
+    @patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('连接超时'))
+    def test_give_up_after_max_attempts(self, mock_send):
+        """测试超过最大重试次数后标记为失败"""
+        send_email('标题', '内容', ['a@test.com'])
+        OutboxMail.objects.update(attempts=MAX_ATTEMPTS - 1)
+        process_outbox()
+        self.assertEqual(OutboxMail.objects.get().status, 'failed')
+
+    def test_command_once(self):
+        """测试 send_outbox 命令"""
+        send_email('标题', '内容', ['a@test.com'])
+        out = StringIO()
+        call_command('send_outbox', '--once', stdout=out)
+        self.assertIn('发送成功 1 封', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+class SendMessagesInChunksTests(TestCase):
+    def build_messages(self, recipients):
+        return [EmailMessage('标题', '内容', 'from@test.com', [recipient]) for recipient in recipients]
+
+    @patch('utils.send.get_connection', wraps=get_connection)
+    def test_one_connection_per_chunk(self, mock_connection):
+        """测试每批邮件只建立一个连接"""
+        errors = send_messages_in_chunks(self.build_messages(['a@test.com', 'b@test.com', 'c@test.com']), chunk_size=2)
+        self.assertEqual(errors, [None, None, None])
+        self.assertEqual(mock_connection.call_count, 2)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_report_failed_recipients(self):
+        """测试逐个报告被拒收的收件人"""
+        def send_messages(messages):
+            if messages[0].to == ['bad@test.com']:
+                raise smtplib.SMTPRecipientsRefused({'bad@test.com': (550, b'User not found')})
+            return len(messages)
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            errors = send_messages_in_chunks(self.build_messages(['a@test.com', 'bad@test.com', 'c@test.com']))
+        self.assertIsNone(errors[0])
+        self.assertIn('bad@test.com: 550', errors[1])
+        self.assertIsNone(errors[2])
+
+    def test_partial_failure_in_outbox(self):
+        """测试发件箱中只有失败的邮件安排重试"""
+        send_notice_emails(['a@test.com', 'bad@test.com'], '内容', '标题')
+        def send_messages(messages):
+            if messages[0].to == ['bad@test.com']:
+                raise smtplib.SMTPRecipientsRefused({'bad@test.com': (550, b'User not found')})
+            return len(messages)
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            self.assertEqual(process_outbox(), (1, 1))
+        statuses = {tuple(item.recipients): item.status for item in OutboxMail.objects.all()}
+        self.assertEqual(statuses, {('a@test.com',): 'sent', ('bad@test.com',): 'pending'})
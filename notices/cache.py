@@ -0,0 +1,26 @@
+from django.core.cache import cache
+from django.db import transaction
+from .models import UserNotice
+
+UNREAD_TIMEOUT = 60 * 60 * 24
+
+def get_unread_key(user_id) -> str :
+    return f'unread_notices:{user_id}'
+
+def get_unread_count(user_id, cached=None) -> int :
+    "获取用户未确认的通知数，缓存未命中时查询一次数据库"
+    if cached is None:
+        cached = cache.get(get_unread_key(user_id))
+    if cached is not None:
+        return cached
+    count = UserNotice.objects.filter(user_id=user_id, confirmed=False).count()
+    cache.add(get_unread_key(user_id), count, timeout=UNREAD_TIMEOUT)
+    return count
+
+def invalidate_unread_counts(user_ids) :
+    "清除用户的未读数，下次读取时重新统计；事务提交后再清除一次，避免并发请求缓存提交前的旧值"
+    keys = [get_unread_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,9 +1,47 @@
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from django.core.exceptions import ValidationError
 from .models import Notice, UserNotice
-from detachments.models import Detachment
+from .cache import invalidate_unread_counts
+from utils.events import publish_events
+from detachments.models import Detachment, DetachmentMembership
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    "一次查询校验所有主键，而不是逐个主键查询"
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pks = []
+        for item in data:
+            if isinstance(item, bool):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pks.append(queryset.model._meta.pk.to_python(item))
+            except ValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        pks = list(dict.fromkeys(pks))
+        objects = queryset.in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
 
 class NoticeSerializer(serializers.ModelSerializer):
-    detachment = serializers.PrimaryKeyRelatedField(
+    detachment = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Detachment.objects.all(),
         required = False,
@@ -48,10 +86,17 @@ class NoticeSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         detachments = validated_data.pop("detachment", [])
         notice = Notice.objects.create(**validated_data)
-        notice.detachment.set(detachments)
-        for detachment in detachments:
-            for leader in detachment.get_leaders():
-                UserNotice.objects.get_or_create(user=leader, notice=notice)
+        notice.detachment.add(*detachments)
+        # 一次查询得到所有支队的队长，同一人担任多个支队队长时只通知一次
+        leader_ids = list(DetachmentMembership.objects.filter(
+            role='leader', detachment__in=detachments
+        ).values_list('user_id', flat=True).distinct())
+        UserNotice.objects.bulk_create(
+            [UserNotice(user_id=leader_id, notice=notice) for leader_id in leader_ids],
+            ignore_conflicts=True,
+        )
+        invalidate_unread_counts(leader_ids)
+        publish_events(leader_ids, 'notice', {'id': notice.id})
         return notice
     
     def validate(self, attrs):
@@ -62,6 +107,15 @@ class NoticeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"error": "请至少选择一个支队"})
         return attrs
     
+class NoticeConfirmSummarySerializer(serializers.ModelSerializer):
+    total_count = serializers.IntegerField(read_only=True)
+    confirmed_count = serializers.IntegerField(read_only=True)
+    last_confirmed_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Notice
+        fields = ['id', 'title', 'sender', 'date', 'total_count', 'confirmed_count', 'last_confirmed_at']
+
 class UserNoticeSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='notice.id')
     title = serializers.CharField(source='notice.title')
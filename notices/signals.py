@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import UserNotice
+from .cache import invalidate_unread_counts
+from utils.events import publish_events
+
+@receiver([post_save, post_delete], sender=UserNotice)
+def invalidate_unread_count(sender, instance, **kwargs):
+    " 单条通知记录变化时清除用户的未读数，批量写入需手动处理 "
+    invalidate_unread_counts([instance.user_id])
+
+@receiver(post_save, sender=UserNotice)
+def publish_notice_event(sender, instance, created, **kwargs):
+    " 推送新通知，批量写入需手动处理 "
+    if created:
+        publish_events([instance.user_id], 'notice', {'id': instance.notice_id})
@@ -4,6 +4,14 @@ from rest_framework.test import APIClient
 from rest_framework import status
 from django.urls import reverse
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import Notice
+from mails.models import OutboxMail
+from django.core.cache import cache
+from django.db.models import QuerySet
+from unittest.mock import patch
+from .cache import get_unread_key, get_unread_count
 
 class SendNoticeViewTest(TestCase):
     def setUp(self):
@@ -33,6 +41,37 @@ class SendNoticeViewTest(TestCase):
         response = self.client.post(self.url, self.test_data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_recipients_deduplicated(self):
+        """测试同一队长担任多个支队队长时只收到一条通知"""
+        other = create_detachment(['leader'], [])
+        test_data = {**self.test_data, 'detachment': [self.detachment.pk, other.pk]}
+        response = self.client.post(self.url, test_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        notice = Notice.objects.get()
+        self.assertEqual(list(notice.recipients.values_list('user__username', flat=True)), ['leader'])
+        self.assertEqual(OutboxMail.objects.count(), 1)
+
+    def test_nonexistent_detachment(self):
+        """测试支队主键不存在"""
+        test_data = {**self.test_data, 'detachment': [self.detachment.pk, 10000]}
+        response = self.client.post(self.url, test_data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Notice.objects.exists())
+
+    def test_constant_query_count(self):
+        """测试发送通知的查询次数与支队数量无关"""
+        def count_queries(detachment_count):
+            leaders = create_normal_user([f'leader_{detachment_count}_{i}' for i in range(detachment_count)])
+            detachments = [create_detachment([leader.username], []) for leader in leaders]
+            test_data = {**self.test_data, 'detachment': [detachment.pk for detachment in detachments]}
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, test_data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries)
+        # 预热用户缓存
+        count_queries(1)
+        self.assertEqual(count_queries(2), count_queries(10))
+
     def test_empty_title(self):
         """测试通知标题为空"""
         test_data = self.test_data.copy()
@@ -180,4 +219,109 @@ class QueryConfirmViewTest(TestCase):
         test_data = self.test_data.copy()
         test_data['id'] = self.notice.pk + 1
         response = self.client.post(self.url, test_data)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ConfirmSummaryViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('confirm-summary')
+        self.admin = create_super_administrator()
+        self.leaders = create_normal_user(['leader_1', 'leader_2'])
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.admin).access_token)
+        self.detachments = [create_detachment([leader.username], []) for leader in self.leaders]
+        self.notice = create_notice(detachments=self.detachments)
+        self.other_notice = create_notice(detachments=self.detachments[:1])
+
+    def test_summary(self):
+        """测试汇总各通知的确认情况"""
+        leader_client = APIClient()
+        leader_client.cookies['access_token'] = str(RefreshToken.for_user(self.leaders[0]).access_token)
+        leader_client.post(reverse('confirm'), {'id': self.notice.pk})
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {item['id']: item for item in response.data['results']}
+        self.assertEqual(results[self.notice.pk]['total_count'], 2)
+        self.assertEqual(results[self.notice.pk]['confirmed_count'], 1)
+        self.assertIsNotNone(results[self.notice.pk]['last_confirmed_at'])
+        self.assertEqual(results[self.other_notice.pk]['total_count'], 1)
+        self.assertEqual(results[self.other_notice.pk]['confirmed_count'], 0)
+        self.assertIsNone(results[self.other_notice.pk]['last_confirmed_at'])
+
+    def test_query_count(self):
+        """测试一页通知只需统计总数和查询本页两次查询"""
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_permission_denied(self):
+        """测试权限不足"""
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.leaders[0]).access_token)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class UnreadNoticeTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.leader = create_normal_user('leader')
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.leader).access_token)
+        self.detachment = create_detachment(['leader'], [])
+        self.notices = [create_notice(detachments=[self.detachment], title=f'notice {i}') for i in range(3)]
+
+    def test_bulk_confirm(self):
+        """测试批量确认通知"""
+        ids = [notice.pk for notice in self.notices[:2]]
+        response = self.client.post(reverse('bulk-confirm'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['confirmed'], 2)
+        # 已确认的通知不会重复更新
+        response = self.client.post(reverse('bulk-confirm'), {'ids': ids}, format='json')
+        self.assertEqual(response.data['confirmed'], 0)
+
+    def test_bulk_confirm_invalid_ids(self):
+        """测试批量确认时主键列表无效"""
+        response = self.client.post(reverse('bulk-confirm'), {'ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('bulk-confirm'), {'ids': ['abc']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unread_count(self):
+        """测试未读数由缓存提供，并随确认和新通知更新"""
+        url = reverse('unread-count')
+        self.assertEqual(self.client.get(url).data['unread'], 3)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['unread'], 3)
+        self.client.post(reverse('bulk-confirm'), {'ids': [self.notices[0].pk]}, format='json')
+        # 确认后清除计数，下次读取重新统计一次
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['unread'], 2)
+        self.client.post(reverse('confirm'), {'id': self.notices[1].pk})
+        self.assertEqual(self.client.get(url).data['unread'], 1)
+
+        admin_client = APIClient()
+        admin_client.cookies['access_token'] = str(RefreshToken.for_user(create_super_administrator()).access_token)
+        admin_client.post(reverse('send-notice'), {'title': 'new', 'content': 'new', 'detachment': [self.detachment.pk]})
+        self.assertEqual(self.client.get(url).data['unread'], 2)
+
+    def test_bulk_confirm_after_concurrent_recount(self):
+        """测试并发请求已按更新后的数据重新统计时，确认不会使计数偏低"""
+        url = reverse('unread-count')
+        self.assertEqual(self.client.get(url).data['unread'], 3)
+        real_update = QuerySet.update
+
+        def update_then_recount(queryset, **kwargs):
+            # 模拟另一个请求在 UPDATE 之后、缓存处理之前重新统计并写入缓存
+            updated = real_update(queryset, **kwargs)
+            cache.delete(get_unread_key(self.leader.id))
+            get_unread_count(self.leader.id)
+            return updated
+
+        with patch.object(QuerySet, 'update', update_then_recount):
+            self.client.post(reverse('bulk-confirm'), {'ids': [self.notices[0].pk]}, format='json')
+        self.assertEqual(self.client.get(url).data['unread'], 2)
+
+    def test_unread_count_unauthenticated(self):
+        """测试用户未登录"""
+        response = APIClient().get(reverse('unread-count'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
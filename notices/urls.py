@@ -1,10 +1,13 @@
 from django.urls import path
-from .views import SendNoticeView, GetNoticeView, ConfirmView, QueryView, QueryConfirmView
+from .views import SendNoticeView, GetNoticeView, ConfirmView, QueryView, QueryConfirmView, ConfirmSummaryView, BulkConfirmView, UnreadCountView
 
 urlpatterns = [
     path('send-notice/', SendNoticeView.as_view(), name='send-notice'),
     path('get-notice/', GetNoticeView.as_view(), name='get-notice'),
     path('confirm/', ConfirmView.as_view(), name='confirm'),
+    path('bulk-confirm/', BulkConfirmView.as_view(), name='bulk-confirm'),
+    path('unread-count/', UnreadCountView.as_view(), name='unread-count'),
     path('query/', QueryView.as_view(), name='notice-query'),
     path('query-confirm/', QueryConfirmView.as_view(), name='query-confirm'),
+    path('confirm-summary/', ConfirmSummaryView.as_view(), name='confirm-summary'),
 ]
\ No newline at end of file
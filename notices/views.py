@@ -2,14 +2,21 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
-from users.models import CustomUser
-from .serializers import NoticeSerializer, UserNoticeSerializer
+from .serializers import NoticeSerializer, UserNoticeSerializer, NoticeConfirmSummarySerializer
 from .models import Notice, UserNotice
 from utils.get import get_user_from_request
 from django.utils import timezone
-from utils.send import send_notice_email
+from utils.send import send_notice_emails
 from utils.check import check_administrator_from_request
 from utils.pagination import CustomPagination
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+from users.cache import get_principal_key, load_principal
+from users.tokens import check_permission_version
+from utils.cache import get_token_claims
+from .cache import get_unread_key, get_unread_count, invalidate_unread_counts
 
 not_permitted = "用户权限不足"
 
@@ -21,15 +28,14 @@ class SendNoticeView(APIView) :
         
         serializer = NoticeSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)  # 自动抛出 ValidationError
-        notice = serializer.save()
-        
-        detachment_leaders = [un.user for un in notice.recipients.all()]
-        content = notice.content + f'\n\n发自：{notice.sender}'
-        title = notice.title
+        with transaction.atomic():
+            notice = serializer.save()
+
+            emails = list(notice.recipients.values_list('user__email', flat=True))
+            content = notice.content + f'\n\n发自：{notice.sender}'
+            title = notice.title
 
-        for leader in detachment_leaders:
-            email = leader.email
-            send_notice_email(email, content, title)
+            send_notice_emails(emails, content, title)
 
         return Response({'message':'发送成功'}, status=status.HTTP_200_OK)
 
@@ -64,6 +70,45 @@ class ConfirmView(APIView):
             user_notice.save()
             return Response({"message": "确认成功"}, status=status.HTTP_200_OK)
 
+class BulkConfirmView(APIView):
+    "批量确认通知，只更新一条语句"
+    def post(self, request):
+        user = get_user_from_request(request)
+        if isinstance(user, Response):
+            return user
+        data = request.data
+        ids = data.getlist('ids') if hasattr(data, 'getlist') else data.get('ids')
+        if not isinstance(ids, list) or len(ids) == 0:
+            return Response({"error":"请传入通知主键列表"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(primary_key) for primary_key in ids]
+        except (TypeError, ValueError):
+            return Response({"error":"通知主键类型错误"}, status=status.HTTP_400_BAD_REQUEST)
+
+        confirmed = UserNotice.objects.filter(user=user, notice_id__in=ids, confirmed=False).update(
+            confirmed=True, confirmed_at=timezone.now()
+        )
+        if confirmed:
+            # 直接扣减会与并发的重新统计相互覆盖，清除后由下次读取重新统计
+            invalidate_unread_counts([user.id])
+        return Response({"message": "确认成功", "confirmed": confirmed}, status=status.HTTP_200_OK)
+
+class UnreadCountView(APIView):
+    "查询未确认的通知数，只在本地校验令牌签名，未读数与用户记录（含权限版本号）在同一次Redis读取中获取"
+    authentication_classes = []
+
+    def get(self, request):
+        claims = get_token_claims(request)
+        if not claims or api_settings.USER_ID_CLAIM not in claims:
+            return Response({"error": "用户未登录"}, status=status.HTTP_400_BAD_REQUEST)
+        user_id = claims[api_settings.USER_ID_CLAIM]
+        unread_key = get_unread_key(user_id)
+        principal_key = get_principal_key(user_id)
+        values = cache.get_many([unread_key, principal_key])
+        if not check_permission_version(claims, load_principal(user_id, values.get(principal_key))):
+            return Response({"error": "用户未登录"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"unread": get_unread_count(user_id, values.get(unread_key))}, status=status.HTTP_200_OK)
+
 class QueryView(ListAPIView):
     queryset = Notice.objects.all().order_by("id")
     serializer_class = NoticeSerializer
@@ -89,6 +134,23 @@ class QueryConfirmView(APIView):
             notice = Notice.objects.get(id=primary_key)
         except Notice.DoesNotExist:
             return Response({"error":"未找到对应通知"}, status=status.HTTP_400_BAD_REQUEST)
-        all_user = CustomUser.objects.filter(user_notices__notice=notice).values_list('username', flat=True)
-        confirmed_user = CustomUser.objects.filter(user_notices__notice=notice, user_notices__confirmed=True).values_list('username', flat=True)
-        return Response({"title": notice.title, "all_user": all_user, "confirmed_user": confirmed_user}, status=status.HTTP_200_OK)
\ No newline at end of file
+        # 一次查询得到所有接收人及确认情况
+        recipients = list(notice.recipients.order_by('-user_id').values_list('user__username', 'confirmed'))
+        all_user = [username for username, _ in recipients]
+        confirmed_user = [username for username, confirmed in recipients if confirmed]
+        return Response({"title": notice.title, "all_user": all_user, "confirmed_user": confirmed_user}, status=status.HTTP_200_OK)
+
+class ConfirmSummaryView(ListAPIView):
+    "分页查询各通知的接收人数、确认人数及最近确认时间，完整名单通过 QueryConfirmView 按需获取"
+    queryset = Notice.objects.annotate(
+        total_count=Count('recipients'),
+        confirmed_count=Count('recipients', filter=Q(recipients__confirmed=True)),
+        last_confirmed_at=Max('recipients__confirmed_at'),
+    ).order_by('-id')
+    serializer_class = NoticeConfirmSummarySerializer
+    pagination_class = CustomPagination
+
+    def list(self, request, *args, **kwargs):
+        if not check_administrator_from_request(request):
+            return Response({"error": not_permitted}, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
@@ -1,7 +1,10 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework import exceptions, status
 from rest_framework.response import Response
+from .cache import get_cached_user
+from .tokens import check_permission_version
 
 class AuthenticationFailedError(exceptions.APIException):
     status_code = status.HTTP_400_BAD_REQUEST
@@ -9,6 +12,19 @@ class AuthenticationFailedError(exceptions.APIException):
     default_code = 'authentication_failed'
 
 class CookieJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # 从缓存中读取用户，避免每个请求都查询数据库
+        try :
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken('令牌中不包含用户信息') from e
+        user = get_cached_user(user_id)
+        if user is None :
+            raise exceptions.AuthenticationFailed('用户不存在', code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active :
+            raise exceptions.AuthenticationFailed('用户已被禁用', code='user_inactive')
+        return user
+
     def authenticate(self, request):
         # 优先从 Cookie 获取 Token
         access_token = request.COOKIES.get('access_token')
@@ -17,6 +33,10 @@ class CookieJWTAuthentication(JWTAuthentication):
             try :
                 validated_token = self.get_validated_token(access_token)
                 user = self.get_user(validated_token)
+                self.check_permission_version(validated_token, user)
+                # 缓存到底层请求上，供 utils.get / utils.check 复用，避免重复解码令牌和查询用户
+                request._request.validated_token = validated_token
+                request._request.principal = user
                 return (user, validated_token)
             except InvalidToken as e:
                 raise AuthenticationFailedError from e
@@ -24,4 +44,12 @@ class CookieJWTAuthentication(JWTAuthentication):
                 raise AuthenticationFailedError from e
         
         # 如果 Cookie 中没有，回退到 Header 中读取
-        return super().authenticate(request)
\ No newline at end of file
+        result = super().authenticate(request)
+        if result is not None :
+            self.check_permission_version(result[1], result[0])
+        return result
+
+    def check_permission_version(self, validated_token, user):
+        # 权限变更后，此前签发的令牌不再有效；复用已读取的用户，不再重复访问缓存
+        if not check_permission_version(validated_token, user) :
+            raise InvalidToken('用户权限已变更，请重新登录')
\ No newline at end of file
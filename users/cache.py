@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.db import router
+from .models import CustomUser
+
+# 缓存的用户字段，按模型字段顺序排列，便于通过 from_db 还原为用户实例
+PRINCIPAL_FIELDS = tuple(
+    field.attname for field in CustomUser._meta.concrete_fields
+    if field.attname in {'id', 'username', 'email', 'is_active', 'student_id', 'phone_number', 'lark_open_id', 'user_permission', 'permission_version'}
+)
+PRINCIPAL_TIMEOUT = 60 * 60
+
+def get_principal_key(user_id) -> str :
+    return f'principal:{user_id}'
+
+def count_principal_cache(result : str) :
+    "记录缓存命中/未命中次数"
+    key = f'principal_cache:{result}'
+    try :
+        cache.incr(key)
+    except ValueError :
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+def get_cached_user(user_id) -> CustomUser | None :
+    "从缓存中获取用户，未命中时查询一次数据库并写入缓存"
+    return load_principal(user_id, cache.get(get_principal_key(user_id)))
+
+def load_principal(user_id, values) -> CustomUser | None :
+    "由已读取的缓存值还原用户，values 为 None 时查询数据库并写入缓存"
+    key = get_principal_key(user_id)
+    if values is None :
+        count_principal_cache('miss')
+        values = CustomUser.objects.filter(id=user_id).values_list(*PRINCIPAL_FIELDS).first()
+        if values is None :
+            return None
+        cache.set(key, values, timeout=PRINCIPAL_TIMEOUT)
+    else :
+        count_principal_cache('hit')
+    # 未缓存的字段为延迟加载字段，访问时才查询；save() 也只会更新已加载的字段
+    return CustomUser.from_db(router.db_for_read(CustomUser), PRINCIPAL_FIELDS, values)
+
+def invalidate_principal(user_id) :
+    cache.delete(get_principal_key(user_id))
+
+def get_principal_cache_stats() -> dict :
+    "获取缓存命中统计"
+    hit = cache.get('principal_cache:hit') or 0
+    miss = cache.get('principal_cache:miss') or 0
+    total = hit + miss
+    return {'hit': hit, 'miss': miss, 'hit_rate': hit / total if total else 0.0}
+
+def reset_principal_cache_stats() :
+    cache.delete_many(['principal_cache:hit', 'principal_cache:miss'])
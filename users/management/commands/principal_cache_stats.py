@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from users.cache import get_principal_cache_stats, reset_principal_cache_stats
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the cached user principal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing')
+
+    def handle(self, *args, **options):
+        stats = get_principal_cache_stats()
+        self.stdout.write(f"hit: {stats['hit']}, miss: {stats['miss']}, hit rate: {stats['hit_rate']:.2%}")
+        if options['reset']:
+            reset_principal_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
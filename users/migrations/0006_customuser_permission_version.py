@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_alter_customuser_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='permission_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -12,6 +12,8 @@ class CustomUser(AbstractUser):
         super_administrator = 3, '超级管理员'
     
     user_permission = models.IntegerField(choices=UserPermissions, default=UserPermissions.normal_user)
+    # 权限变更时递增，令牌中的版本号与之不一致时失效
+    permission_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.username
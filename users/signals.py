@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CustomUser
+from .cache import invalidate_principal
+from utils.pagination import track_count
+
+track_count(CustomUser)
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_principal_cache(sender, instance, **kwargs):
+    " 用户信息变化时清除缓存的用户记录 "
+    invalidate_principal(instance.pk)
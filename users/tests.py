@@ -2,10 +2,14 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from users.models import CustomUser
 from django.core.cache import cache
 from utils.test import create_normal_user, create_administrator, create_super_administrator
+from users.cache import get_cached_user, get_principal_cache_stats, reset_principal_cache_stats
+from users.tokens import PermissionRefreshToken, PERMISSION_CLAIM
+from utils.check import check_administrator_from_request, check_super_administrator_from_request
+from django.test import RequestFactory
 from urllib.parse import quote, unquote
 from unittest.mock import patch
 
@@ -219,6 +223,39 @@ class GetUserViewTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 2)
 
+    def test_cursor_pagination(self):
+        """测试游标分页"""
+        create_normal_user([f'user_{i}' for i in range(12)])
+        response = self.client.get(self.url, {'cursor': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 10)
+        first_page = [user['id'] for user in response.data['results']]
+        self.assertEqual(first_page, sorted(first_page, reverse=True))
+        # 第二页只查询数据本身，不统计总数
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'cursor': response.data['next_cursor']})
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIsNone(response.data['next'])
+        self.assertLess(response.data['results'][0]['id'], first_page[-1])
+
+    def test_cached_count(self):
+        """测试总数缓存及写入后失效"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 2)
+        # 缓存命中后只查询当前页数据
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 2)
+        create_normal_user('another')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_invalid_cursor(self):
+        """测试无效的游标"""
+        response = self.client.get(self.url, {'cursor': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_unauthorized_access(self):
         client = APIClient()
         response = client.get(self.url)
@@ -326,6 +363,61 @@ class ModifyPermissionViewTests(TestCase):
         response = self.client.post(self.url, data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_stale_token_rejected(self):
+        """测试修改权限后旧令牌失效"""
+        client = APIClient()
+        client.cookies['access_token'] = str(PermissionRefreshToken.for_user(self.normal_user).access_token)
+        response = client.get(reverse('user-info'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.post(self.url, {'username': 'user', 'user_permission': '普通管理员'})
+        response = client.get(reverse('user-info'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stale_token_rejected_after_cache_loss(self):
+        """测试Redis数据丢失后被降权管理员的旧令牌仍然无效"""
+        admin = create_administrator()
+        token = str(PermissionRefreshToken.for_user(admin).access_token)
+        self.client.post(self.url, {'username': admin.username, 'user_permission': '普通用户'})
+        cache.clear()
+        request = RequestFactory().get('/')
+        request.COOKIES['access_token'] = token
+        self.assertFalse(check_administrator_from_request(request))
+
+    def test_legacy_token_accepted(self):
+        """测试未携带权限版本号的旧令牌在过期前一直有效，权限从用户记录读取"""
+        client = APIClient()
+        client.cookies['access_token'] = str(RefreshToken.for_user(self.normal_user).access_token)
+        self.assertEqual(client.get(reverse('user-info')).status_code, status.HTTP_200_OK)
+        self.client.post(self.url, {'username': self.normal_user.username, 'user_permission': '普通管理员'})
+        response = client.get(reverse('user-info'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        request = RequestFactory().get('/')
+        request.COOKIES['access_token'] = client.cookies['access_token'].value
+        self.assertTrue(check_administrator_from_request(request))
+
+class PermissionTokenTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.admin = create_administrator()
+
+    def test_login_token_contains_permission(self):
+        """测试登录签发的令牌携带权限"""
+        self.admin.set_password('Testpass123')
+        self.admin.save()
+        response = APIClient().post(reverse('login'), {'username': 'test_administrator', 'password': 'Testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = AccessToken(response.cookies['access_token'].value)
+        self.assertEqual(token[PERMISSION_CLAIM], CustomUser.UserPermissions.administrator)
+
+    def test_check_without_database(self):
+        """测试令牌携带权限且用户记录已缓存时权限检查不访问数据库"""
+        request = self.factory.get('/')
+        request.COOKIES['access_token'] = str(PermissionRefreshToken.for_user(self.admin).access_token)
+        get_cached_user(self.admin.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(check_administrator_from_request(request))
+            self.assertFalse(check_super_administrator_from_request(request))
+
 class FeishuBindViewTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -406,4 +498,69 @@ class GetUserByIdViewTests(TestCase):
 
     def test_user_does_not_exist(self):
         response = self.client.post(self.url, {"id": 99999})
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class UserInfoViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('user-info')
+        self.user = create_normal_user('test_user')
+
+    def test_user_loaded_once_per_request(self):
+        """测试同一请求内只查询一次用户"""
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user-info']['username'], 'test_user')
+        # 第二次请求直接命中缓存，且只读取一次缓存
+        reset_principal_cache_stats()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_principal_cache_stats()['hit'], 1)
+
+    def test_not_logged_in(self):
+        """测试未登录"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PrincipalCacheTests(TestCase):
+    def setUp(self):
+        self.user = create_normal_user('test_user')
+        reset_principal_cache_stats()
+
+    def test_cache_hit(self):
+        """测试第二次读取命中缓存"""
+        get_cached_user(self.user.id)
+        with self.assertNumQueries(0):
+            user = get_cached_user(self.user.id)
+        self.assertEqual(user.username, 'test_user')
+        self.assertEqual(get_principal_cache_stats()['hit'], 1)
+        self.assertEqual(get_principal_cache_stats()['miss'], 1)
+
+    def test_invalidate_on_save(self):
+        """测试修改用户后缓存失效"""
+        get_cached_user(self.user.id)
+        self.user.user_permission = CustomUser.UserPermissions.administrator
+        self.user.save()
+        self.assertEqual(get_cached_user(self.user.id).user_permission, CustomUser.UserPermissions.administrator)
+
+    def test_invalidate_on_delete(self):
+        """测试删除用户后缓存失效"""
+        user_id = self.user.id
+        get_cached_user(user_id)
+        self.user.delete()
+        self.assertIsNone(get_cached_user(user_id))
+
+    def test_save_cached_user(self):
+        """测试保存缓存中的用户不会覆盖未加载的字段"""
+        self.user.set_password('Testpass123')
+        self.user.save()
+        user = get_cached_user(self.user.id)
+        user.lark_open_id = 'new_lark_id'
+        user.save()
+        user = CustomUser.objects.get(id=self.user.id)
+        self.assertEqual(user.lark_open_id, 'new_lark_id')
+        self.assertTrue(user.check_password('Testpass123'))
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import CustomUser
+from .cache import invalidate_principal
+
+PERMISSION_CLAIM = 'user_permission'
+PERMISSION_VERSION_CLAIM = 'permission_version'
+
+def bump_permission_version(user_id) :
+    "用户权限变化时在数据库中递增版本号，使此前签发的令牌失效"
+    CustomUser.objects.filter(id=user_id).update(permission_version=F('permission_version') + 1)
+    invalidate_principal(user_id)
+    # 事务提交前其他请求可能重新缓存旧版本号，提交后再清除一次
+    transaction.on_commit(lambda: invalidate_principal(user_id))
+
+def check_permission_version(claims, user : CustomUser | None) -> bool :
+    """
+    检查令牌中的权限版本号是否与用户当前的版本号一致。
+    未携带版本号的旧令牌不携带权限，权限总是从用户记录读取，在过期前一直有效。
+    """
+    if user is None :
+        return False
+    if PERMISSION_VERSION_CLAIM not in claims :
+        return True
+    return claims[PERMISSION_VERSION_CLAIM] == user.permission_version
+
+class PermissionRefreshToken(RefreshToken):
+    "在令牌中携带用户权限及权限版本号，访问令牌会复制这两个声明"
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[PERMISSION_CLAIM] = user.user_permission
+        token[PERMISSION_VERSION_CLAIM] = user.permission_version
+        return token
@@ -2,8 +2,8 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from .models import CustomUser
+from .tokens import PermissionRefreshToken, bump_permission_version
 from .serializers import CustomUserSerializer
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.cache import cache
@@ -13,7 +13,7 @@ from urllib.parse import quote, unquote
 from utils.get import get_user_from_request
 from utils.check import check_email, check_password, check_username, check_phone_number, check_student_id, check_verification_code, check_administrator_from_request
 from utils.send import send_verification_email
-from utils.pagination import CustomPagination
+from utils.pagination import CachedCountPagination
 from django.conf import settings
 from django.urls import reverse
 from urllib.parse import urlencode
@@ -125,7 +125,7 @@ class LoginView(APIView):
             if not user or not user.check_password(password):
                 return Response({"error": "登录凭据无效"}, status=status.HTTP_400_BAD_REQUEST)
 
-            token = RefreshToken.for_user(user)
+            token = PermissionRefreshToken.for_user(user)
             access_token = str(token.access_token)
             refresh_token = str(token)
             serializer = CustomUserSerializer(user)
@@ -174,7 +174,7 @@ class SendEmailView(APIView):
 class GetUserView(ListAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
-    pagination_class = CustomPagination
+    pagination_class = CachedCountPagination
 
     def list(self, request, *args, **kwargs):
         # 执行权限检查
@@ -187,7 +187,7 @@ class GetUserView(ListAPIView):
 class GetAdminView(ListAPIView):
     queryset = CustomUser.objects.filter(user_permission=CustomUser.UserPermissions.administrator)
     serializer_class = CustomUserSerializer
-    pagination_class = CustomPagination
+    pagination_class = CachedCountPagination
 
     def list(self, request, *args, **kwargs):
         # 执行权限检查
@@ -200,7 +200,7 @@ class GetAdminView(ListAPIView):
 class GetSuperAdminView(ListAPIView):
     queryset = CustomUser.objects.filter(user_permission=CustomUser.UserPermissions.super_administrator)
     serializer_class = CustomUserSerializer
-    pagination_class = CustomPagination
+    pagination_class = CachedCountPagination
 
     def list(self, request, *args, **kwargs):
         # 执行权限检查
@@ -244,6 +244,8 @@ class ModifyPermissionView(APIView):
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         target_user.user_permission = permission
         target_user.save()
+        # 使目标用户此前签发的令牌失效
+        bump_permission_version(target_user.id)
         return Response({"message": "成功修改权限"}, status=status.HTTP_200_OK)
 
 class FeishuBindView(APIView):
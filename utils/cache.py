@@ -0,0 +1,134 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from users.cache import get_principal_key, load_principal
+from users.tokens import PERMISSION_CLAIM, check_permission_version
+from contextlib import contextmanager
+from contextvars import ContextVar
+import hashlib
+import time
+
+_invalidation_suspended = ContextVar('invalidation_suspended', default=False)
+
+@contextmanager
+def suspend_invalidation() :
+    "代码块内逐条写入不触发缓存失效（响应缓存及分页数量缓存），调用方需在结束后统一使缓存失效"
+    token = _invalidation_suspended.set(True)
+    try :
+        yield
+    finally :
+        _invalidation_suspended.reset(token)
+
+def invalidation_suspended() -> bool :
+    return _invalidation_suspended.get()
+
+# 模型 -> 依赖该模型的视图名称
+response_cache_registry = {}
+
+def get_response_version_key(view_name : str) -> str :
+    return f'response_version:{view_name}'
+
+def bump_response_versions(view_names) :
+    "更新视图的版本号，旧版本号下缓存的响应不再被读取，到期后由Redis自动清除"
+    cache.set_many({get_response_version_key(view_name): time.time_ns() for view_name in view_names}, timeout=None)
+
+def invalidate_response_cache(*models) :
+    "使依赖这些模型的视图的缓存响应失效，批量写入（bulk_create/update）不会触发信号，需要手动调用"
+    view_names = set()
+    for model in models:
+        view_names.update(response_cache_registry.get(model, ()))
+    if not view_names:
+        return
+    bump_response_versions(view_names)
+    if transaction.get_connection().in_atomic_block:
+        # 事务提交前其他请求可能以新版本号缓存旧数据，提交后再更新一次
+        transaction.on_commit(lambda: bump_response_versions(view_names))
+
+def invalidate_response_on_write(sender, **kwargs) :
+    if not invalidation_suspended():
+        invalidate_response_cache(sender)
+
+def get_token_claims(request) -> dict | None :
+    "只校验签名和有效期，不访问数据库和缓存；未登录返回空字典，令牌无效返回None"
+    raw_token = request.COOKIES.get('access_token')
+    if not raw_token:
+        # 通过请求头传递令牌的请求走完整的认证流程
+        return None if 'HTTP_AUTHORIZATION' in request.META else {}
+    try :
+        return AccessToken(raw_token).payload
+    except TokenError:
+        return None
+
+class CachedResponseMixin:
+    """
+    在Redis中缓存读多写少的查询视图渲染后的JSON响应，缓存命中时只需两次Redis读取。
+    缓存按（视图版本号，查询参数，用户权限，Accept）区分，cache_models 中的模型写入或删除时更新视图版本号，
+    响应携带强 ETag，请求头 If-None-Match 与之相同时返回304。
+    令牌中未携带权限声明的请求不使用缓存。
+    """
+    cache_models = ()
+    cache_timeout = 600
+    # 为True时未登录的请求不使用缓存，交由视图返回错误
+    cache_login_required = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for model in cls.cache_models:
+            response_cache_registry.setdefault(model, set()).add(cls.__name__)
+            post_save.connect(invalidate_response_on_write, sender=model, dispatch_uid=f'response_cache_save_{model._meta.label}')
+            post_delete.connect(invalidate_response_on_write, sender=model, dispatch_uid=f'response_cache_delete_{model._meta.label}')
+
+    def get_response_cache_key(self, request, claims : dict, version) -> str :
+        "缓存按（视图版本号，用户权限，查询参数，Accept）区分"
+        permission = claims[PERMISSION_CLAIM] if claims else 'anonymous'
+        params = sorted(request.GET.lists())
+        digest = hashlib.md5(f"{params}|{request.META.get('HTTP_ACCEPT', '')}".encode('utf-8')).hexdigest()
+        return f'response:{type(self).__name__}:{version}:{permission}:{digest}'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return super().dispatch(request, *args, **kwargs)
+        claims = get_token_claims(request)
+        if claims is None or (claims and PERMISSION_CLAIM not in claims) or (not claims and self.cache_login_required):
+            return super().dispatch(request, *args, **kwargs)
+
+        # 视图的版本号与用户记录（含权限版本号）在同一次Redis读取中获取
+        version_key = get_response_version_key(type(self).__name__)
+        principal_key = get_principal_key(claims[api_settings.USER_ID_CLAIM]) if claims else None
+        values = cache.get_many([version_key, principal_key] if principal_key else [version_key])
+        if principal_key and not check_permission_version(
+            claims, load_principal(claims[api_settings.USER_ID_CLAIM], values.get(principal_key))
+        ):
+            # 权限已变更的令牌交由认证流程拒绝
+            return super().dispatch(request, *args, **kwargs)
+
+        # 版本号须在查询数据库之前读取，写入提交后更新的版本号不会用于缓存旧数据
+        key = self.get_response_cache_key(request, claims, values.get(version_key, 0))
+        cached = cache.get(key)
+        if cached is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or not hasattr(response, 'render'):
+                return response
+            response.render()
+            if not response.get('Content-Type', '').startswith('application/json'):
+                return response
+            cached = (f'"{hashlib.sha1(response.content).hexdigest()}"', response['Content-Type'], response.content)
+            cache.set(key, cached, timeout=self.cache_timeout)
+            response['ETag'] = cached[0]
+        else:
+            response = HttpResponse(cached[2], content_type=cached[1])
+            response['ETag'] = cached[0]
+        patch_vary_headers(response, ('Cookie', 'Accept'))
+
+        if cached[0] in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = cached[0]
+            patch_vary_headers(not_modified, ('Cookie', 'Accept'))
+            return not_modified
+        return response
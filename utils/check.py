@@ -1,7 +1,7 @@
 import re
 from users.models import CustomUser
 from detachments.models import Detachment, DetachmentMembership
-from rest_framework_simplejwt.tokens import AccessToken
+from utils.get import get_principal, get_permission_from_request, get_user_id_map
 from rest_framework.response import Response
 from rest_framework import status
 import pandas as pd
@@ -52,74 +52,57 @@ def check_verification_code(code : str) -> bool:
     pattern = r'^\d{6}$'
     return bool(re.match(pattern, code))
 
-def check_detachment_leader_input(detachment : list[str]) :
-    " 检查输入的支队长列表是否合法 "
-    if not isinstance(detachment, list) or len(detachment) == 0:
+def check_username_format(usernames) -> bool :
+    "检查用户名列表中的每一项是否为合法字符串"
+    return all(isinstance(name, str) and len(name) <= 100 for name in usernames)
+
+def check_usernames_exist(usernames, user_map : dict) -> Response | None :
+    "检查用户名是否全部存在，一次性报告所有不存在的用户"
+    missing = [name for name in dict.fromkeys(usernames) if name not in user_map]
+    if missing :
+        return Response({'error':f"用户 {'、'.join(missing)} 不存在"}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+def check_detachment_input(leaders : list[str], members : list[str]) -> dict | Response :
+    " 检查支队长和支队员列表，合法时返回用户名到用户主键的映射，整个过程只查询一次数据库 "
+    if not isinstance(leaders, list) or len(leaders) == 0:
         return Response({'error':'支队长信息格式非法'},status=status.HTTP_400_BAD_REQUEST)
-    for name in detachment :
-        if not isinstance(name, str) or len(name) > 100 :
-            return Response({'error':'输入格式非法'}, status=status.HTTP_400_BAD_REQUEST)
-        if not CustomUser.objects.filter(username = name).exists() :
-            return Response({'error':f"用户 {name} 不存在"}, status=status.HTTP_400_BAD_REQUEST)
-    return 1
-
-def check_detachment_member_input(detachment : list[str]) :
-    " 检查输入的支队员列表是否合法 "
-    if not isinstance(detachment, list):
+    if not check_username_format(leaders) :
+        return Response({'error':'输入格式非法'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(members, list):
         return Response({'error':'支队员信息格式非法'},status=status.HTTP_400_BAD_REQUEST)
-    for name in detachment :
-        if not isinstance(name, str) or len(name) > 100 :
-            return Response({'error':'输入格式非法'}, status=status.HTTP_400_BAD_REQUEST)
-        if not CustomUser.objects.filter(username = name).exists() :
-            return Response({'error':f"用户 {name} 不存在"}, status=status.HTTP_400_BAD_REQUEST)
-    return 1
-
-def check_user_permission(access_token : str) -> bool :
-    " 检查用户是否权限至少是管理员 "
-    try :
-        token = AccessToken(access_token)
-        user_id = token['user_id']
-        user = CustomUser.objects.get(id = user_id)
-        if user.user_permission >= CustomUser.UserPermissions.administrator:
-            return True
-        return False
-    except Exception :
-        return False
-    
-def check_detachment_leader(access_token : str, key : int) -> bool :
-    " 检查传入的用户是不是对应支队的支队长 "
+    if not check_username_format(members) :
+        return Response({'error':'输入格式非法'}, status=status.HTTP_400_BAD_REQUEST)
+    leader_set = set(leaders)
+    duplicated = [name for name in dict.fromkeys(members) if name in leader_set]
+    if duplicated :
+        return Response({'error':f"用户 {'、'.join(duplicated)} 不能同时是支队长和支队员"}, status=status.HTTP_400_BAD_REQUEST)
+    user_map = get_user_id_map(leaders + members)
+    response = check_usernames_exist(leaders + members, user_map)
+    if response is not None :
+        return response
+    return user_map
+
+def check_leader_of_detachment(user : CustomUser, key : int) -> bool :
+    " 检查用户是不是主键为key的支队的支队长 "
     try :
-        token = AccessToken(access_token)
-        user_id = token['user_id']
-        user = CustomUser.objects.get(id = user_id)
-        detachment = Detachment.objects.get(id = key)
-        try :
-            membership = DetachmentMembership.objects.get(user=user, detachment=detachment)
-            return membership.role == 'leader'
-        except DetachmentMembership.DoesNotExist:
-            return False
-    except Exception :
+        return DetachmentMembership.objects.filter(user=user, detachment_id=key, role='leader').exists()
+    except (TypeError, ValueError) :
         return False
+
+def check_detachment_leader_from_request(request, key : int) -> bool :
+    " 根据request检查用户是不是对应支队的支队长 "
+    user = get_principal(request)
+    return user is not None and check_leader_of_detachment(user, key)
     
 def check_administrator_from_request(request) -> bool:
     " 根据request检查用户权限是不是至少是普通管理员 "
-    access_token = request.COOKIES.get("access_token")
-    return check_user_permission(access_token)
+    permission = get_permission_from_request(request)
+    return permission is not None and permission >= CustomUser.UserPermissions.administrator
 
-def check_user_super_permission(access_token : str) -> bool:
-    " 检查用户权限是不是超级管理员 "
-    try :
-        token = AccessToken(access_token)
-        user_id = token['user_id']
-        user = CustomUser.objects.get(id = user_id)
-        return user.user_permission == CustomUser.UserPermissions.super_administrator
-    except Exception :
-        return False
-    
 def check_super_administrator_from_request(request) -> bool | Response :
     " 根据request检查用户权限是不是至少是超级管理员 "
-    access_token = request.COOKIES.get("access_token")
-    return check_user_super_permission(access_token)
+    return get_permission_from_request(request) == CustomUser.UserPermissions.super_administrator
 
 def check_connection_list_excel(df : pd.DataFrame) -> bool | Response :
     "检查传入的表格是否格式正确"
@@ -142,26 +125,42 @@ def check_whether_detachment_leader(user : CustomUser) -> bool :
     return False
 
 def check_reviewer(reviewer, user) -> bool :
-    '检查用户是不是指定的审核人'
+    '检查用户是不是指定的审核人，可传入用户或用户主键'
     return reviewer == user
 
-def check_user_id_list(user_ids) -> bool | Response :
-    "检查输入的用户主键列表中的用户是否全部存在"
+def check_reviewer_list(reviewers) -> Response | None :
+    "检查审核人列表非空且没有重复"
+    if not isinstance(reviewers, list) or len(reviewers) == 0 :
+        return Response({'error' : "审核人列表不能为空"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(set(reviewers)) != len(reviewers) :
+        return Response({'error' : "审核人不能重复"}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+def check_user_id_list(user_ids) -> list | Response :
+    "一次查询检查输入的用户主键列表中的用户是否全部存在，返回按输入顺序排列的用户主键"
+    try :
+        user_ids = [int(i) for i in user_ids] if isinstance(user_ids, list) else user_ids
+    except (TypeError, ValueError) :
+        return Response({'error' : "用户主键类型错误"}, status=status.HTTP_400_BAD_REQUEST)
+    response = check_reviewer_list(user_ids)
+    if response is not None :
+        return response
+    existing = set(CustomUser.objects.filter(id__in=user_ids).values_list('id', flat=True))
     for i in user_ids :
-        try :
-            CustomUser.objects.get(id=i)
-        except CustomUser.DoesNotExist:
+        if i not in existing :
             return Response({'error' : f"主键为{i}的用户不存在"}, status=status.HTTP_400_BAD_REQUEST)
-    return True
-
-def check_username_list(usernames) -> bool | Response :
-    "检查输入的用户名列表中的用户是否存在"
+    return user_ids
+
+def check_username_list(usernames) -> list | Response :
+    "一次查询检查输入的用户名列表中的用户是否存在，返回按输入顺序排列的用户主键"
+    response = check_reviewer_list(usernames)
+    if response is not None :
+        return response
+    user_map = get_user_id_map(usernames)
     for name in usernames:
-        try :
-            CustomUser.objects.get(username=name)
-        except CustomUser.DoesNotExist:
+        if name not in user_map :
             return Response({'error' : f"用户{name}不存在"}, status=status.HTTP_400_BAD_REQUEST)
-    return True
+    return [user_map[name] for name in usernames]
 
 def check_in_detachment(user : CustomUser, detachment : Detachment) -> bool :
     "返回用户在不在支队中"
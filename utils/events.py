@@ -0,0 +1,46 @@
+from django.db import transaction
+from django_redis import get_redis_connection
+import json
+
+# 每位用户最多保留的事件数及保留时间（秒），客户端断开较久时只能取到最近的事件
+EVENT_STREAM_MAXLEN = 100
+EVENT_STREAM_TIMEOUT = 60 * 60
+
+def get_event_stream_key(user_id) -> str :
+    return f'events:{user_id}'
+
+def publish_events(user_ids, event : str, data : dict) :
+    "事务提交后将事件写入对应用户的Redis Stream，由轮询接口取出"
+    user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id is not None]
+    if not user_ids:
+        return
+    message = {'event': event, 'data': json.dumps(data, ensure_ascii=False, default=str)}
+
+    def publish():
+        connection = get_redis_connection('default')
+        pipeline = connection.pipeline(transaction=False)
+        for user_id in user_ids:
+            key = get_event_stream_key(user_id)
+            pipeline.xadd(key, message, maxlen=EVENT_STREAM_MAXLEN, approximate=True)
+            pipeline.expire(key, EVENT_STREAM_TIMEOUT)
+        pipeline.execute()
+
+    # 推送失败只记录日志，不影响已提交的请求
+    transaction.on_commit(publish, robust=True)
+
+def get_latest_event_id(user_id) -> str :
+    "用户最新事件的编号，没有事件时返回0-0"
+    latest = get_redis_connection('default').xrevrange(get_event_stream_key(user_id), count=1)
+    return latest[0][0].decode() if latest else '0-0'
+
+def read_events(user_id, last_id : str) -> tuple[list, str] :
+    "读取last_id之后的事件，不阻塞等待，返回事件列表及新的游标"
+    response = get_redis_connection('default').xread(
+        {get_event_stream_key(user_id): last_id}, count=EVENT_STREAM_MAXLEN
+    )
+    events = []
+    for _, entries in response:
+        for event_id, fields in entries:
+            last_id = event_id.decode()
+            events.append({'id': last_id, 'event': fields[b'event'].decode(), 'data': json.loads(fields[b'data'])})
+    return events, last_id
@@ -1,16 +1,64 @@
 from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.response import Response
 from users.models import CustomUser
+from users.cache import get_cached_user
+from users.tokens import PERMISSION_CLAIM, check_permission_version
 from rest_framework import status
 from datetime import datetime
 
-def get_user_from_request(request):
-    access_token = request.COOKIES.get('access_token')
+def decode_access_token(access_token : str) -> AccessToken | None :
+    "解码并校验访问令牌的签名和有效期，令牌无效时返回None"
     if not access_token:
+        return None
+    try :
+        return AccessToken(access_token)
+    except TokenError:
+        return None
+
+def authenticate_token(access_token : str) -> tuple[AccessToken | None, CustomUser | None] :
+    "解析访问令牌并读取一次对应用户，令牌无效、用户不存在或权限版本过期时均返回None"
+    token = decode_access_token(access_token)
+    if token is None or 'user_id' not in token:
+        return None, None
+    user = get_cached_user(token['user_id'])
+    if not check_permission_version(token, user):
+        return None, None
+    return token, user
+
+def authenticate_request(request):
+    "解析当前请求的令牌及登录用户，结果缓存在底层请求上，同一请求内只解码一次、只读取一次用户"
+    # DRF 的 Request 包装了 Django 的 HttpRequest，结果统一缓存在底层请求上
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, 'validated_token'):
+        http_request.validated_token, http_request.principal = authenticate_token(http_request.COOKIES.get('access_token'))
+    return http_request
+
+def get_validated_token(request) -> AccessToken | None :
+    "获取当前请求已校验的访问令牌"
+    return authenticate_request(request).validated_token
+
+def get_principal(request) -> CustomUser | None :
+    "获取当前请求的登录用户"
+    return authenticate_request(request).principal
+
+def get_permission_from_request(request) -> int | None :
+    "获取当前请求用户的权限，令牌中携带权限时不访问数据库和缓存"
+    token = get_validated_token(request)
+    if token is not None and PERMISSION_CLAIM in token:
+        return token[PERMISSION_CLAIM]
+    user = get_principal(request)
+    return None if user is None else user.user_permission
+
+def get_user_from_request(request):
+    user = get_principal(request)
+    if user is None:
         return Response({"error": "用户未登录"}, status=status.HTTP_400_BAD_REQUEST)
-    token = AccessToken(access_token)
-    user_id = token['user_id']
-    return CustomUser.objects.get(id = user_id)
+    return user
+
+def get_user_id_map(usernames) -> dict :
+    "一次查询获取用户名到用户主键的映射，不存在的用户名不会出现在结果中"
+    return dict(CustomUser.objects.filter(username__in=set(usernames)).values_list('username', 'id'))
 
 def transform_date(date : str) :
     try :
@@ -1,8 +1,158 @@
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.signals import post_save, post_delete
+from django.utils.functional import cached_property
+from functools import partial
+from utils.cache import invalidation_suspended
+import hashlib
+import time
+
+def get_count_version_key(table : str) -> str :
+    return f'count_version:{table}'
+
+def invalidate_count_cache(*models) :
+    "使依赖这些模型的表的缓存数量失效，批量写入（bulk_create/update）不会触发信号，需要手动调用"
+    cache.set_many({get_count_version_key(model._meta.db_table): time.time_ns() for model in models}, timeout=None)
+
+def invalidate_count_on_write(sender, **kwargs) :
+    if not invalidation_suspended():
+        invalidate_count_cache(sender)
+
+def track_count(*models) :
+    "模型写入或删除时自动使缓存的数量失效"
+    for model in models:
+        post_save.connect(invalidate_count_on_write, sender=model, dispatch_uid=f'count_cache_save_{model._meta.label}')
+        post_delete.connect(invalidate_count_on_write, sender=model, dispatch_uid=f'count_cache_delete_{model._meta.label}')
+
+def get_keyset_ordering(queryset) -> str | None :
+    "返回可用于游标分页的排序（pk 或 -pk），其他排序方式返回None"
+    ordering = queryset.query.order_by
+    if not ordering and queryset.query.default_ordering:
+        ordering = queryset.model._meta.ordering
+    ordering = tuple(ordering)
+    if ordering in ((), ('id',), ('pk',)):
+        return 'pk'
+    if ordering in (('-id',), ('-pk',)):
+        return '-pk'
+    return None
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
+    # 传入 cursor 参数时使用游标分页，不统计总数，翻页代价与页码无关
+    cursor_query_param = "cursor"
+    cursor_mode = False
+
     # 强制返回分页结构，即使数据不足一页
     def paginate_queryset(self, queryset, request, view=None):
-        return super().paginate_queryset(queryset, request, view)
\ No newline at end of file
+        if self.cursor_query_param in request.query_params:
+            ordering = get_keyset_ordering(queryset)
+            # 只有按主键排序的列表支持游标分页，其余仍使用页码分页
+            if ordering is not None:
+                return self.paginate_queryset_by_cursor(queryset, request, ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_queryset_by_cursor(self, queryset, request, ordering):
+        "以上一页最后一条记录的主键为游标，多取一条判断是否还有下一页"
+        self.cursor_mode = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        queryset = queryset.order_by(ordering)
+        if cursor:
+            try:
+                last_pk = int(cursor)
+            except ValueError:
+                raise NotFound('无效的游标')
+            queryset = queryset.filter(pk__gt=last_pk) if ordering == 'pk' else queryset.filter(pk__lt=last_pk)
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        self.next_cursor = page[-1].pk if len(rows) > page_size else None
+        return page
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
+
+
+class CachedCountPaginator(Paginator):
+    "总数缓存在Redis中的分页器，缓存键包含查询语句及所涉及的表的版本号"
+    def __init__(self, object_list, per_page, key_prefix='', timeout=60, estimate_threshold=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self.estimate_threshold = estimate_threshold
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        tables = {queryset.model._meta.db_table}
+        tables.update(join.table_name for join in queryset.query.alias_map.values())
+        versions = cache.get_many([get_count_version_key(table) for table in sorted(tables)])
+        digest = hashlib.md5(f"{sql}|{params}|{sorted(versions.items())}".encode('utf-8')).hexdigest()
+        key = f'count:{self.key_prefix}:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = self.get_estimated_count()
+            if count is None:
+                count = queryset.count()
+            cache.set(key, count, timeout=self.timeout)
+        return count
+
+    def get_estimated_count(self) -> int | None :
+        "未加筛选条件的整表查询在数据量超过阈值时使用MySQL的表统计信息估算总数"
+        queryset = self.object_list
+        query = queryset.query
+        if self.estimate_threshold is None or query.where or query.distinct or len(query.alias_map) > 1:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'mysql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] is None or row[0] < self.estimate_threshold:
+            return None
+        return row[0]
+
+class CachedCountPagination(CustomPagination):
+    """
+    缓存总数的页码分页，视图可通过 count_cache_timeout（秒）和
+    count_estimate_threshold（超过后使用估算值，None 表示始终精确统计）单独配置
+    """
+    count_cache_timeout = 60
+    count_estimate_threshold = 100000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            key_prefix=type(view).__name__ if view is not None else '',
+            timeout=getattr(view, 'count_cache_timeout', self.count_cache_timeout),
+            estimate_threshold=getattr(view, 'count_estimate_threshold', self.count_estimate_threshold),
+        )
+        return super().paginate_queryset(queryset, request, view)
@@ -1,29 +1,74 @@
-from django.core.mail import send_mail
-from THUPracticeOnline_backend import settings
+from django.core.mail import get_connection
+from mails.models import OutboxMail
+import smtplib
+
+# 邮件只写入发件箱，由 send_outbox 命令在后台发送，请求中不再连接SMTP服务器
+
+# 每个SMTP连接发送的邮件数上限，避免超出邮件服务商的单连接限制
+MAIL_CHUNK_SIZE = 50
+
+def enqueue_mail(subject : str, content : str, recipients : list) -> OutboxMail :
+    "将邮件写入发件箱，随当前事务一起提交"
+    return OutboxMail.objects.create(subject=subject, content=content, recipients=list(recipients))
+
+def enqueue_mails(subject : str, content : str, recipients : list) -> list :
+    "为每个收件人单独写入一封邮件，一次插入"
+    return OutboxMail.objects.bulk_create(
+        OutboxMail(subject=subject, content=content, recipients=[recipient]) for recipient in recipients
+    )
+
+def get_send_error(e : Exception) -> str :
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return '；'.join(f'{recipient}: {code} {message!r}' for recipient, (code, message) in e.recipients.items())
+    return str(e) or type(e).__name__
+
+def send_messages_in_chunks(messages : list, chunk_size : int = MAIL_CHUNK_SIZE) -> list :
+    """
+    每批邮件复用同一个SMTP连接发送，
+    返回与 messages 一一对应的失败原因，发送成功的为None
+    """
+    errors = []
+    for start in range(0, len(messages), chunk_size):
+        chunk = messages[start:start + chunk_size]
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            errors.extend([get_send_error(e)] * len(chunk))
+            continue
+        try:
+            for message in chunk:
+                # 逐封发送以便记录每封邮件的结果，连接已打开时 send_messages 不会关闭连接
+                try:
+                    connection.send_messages([message])
+                    errors.append(None)
+                except smtplib.SMTPServerDisconnected as e:
+                    errors.append(get_send_error(e))
+                    connection.close()
+                    connection.open()
+                except Exception as e:
+                    errors.append(get_send_error(e))
+        except Exception as e:
+            # 重新连接失败，本批剩余的邮件均记为失败
+            errors.extend([get_send_error(e)] * (start + len(chunk) - len(errors)))
+        finally:
+            connection.close()
+    return errors
+
 
 def send_verification_email(email, verification_code):
     subject = 'THUPracticeOnline网站注册验证码'
     message = f'您的验证码是：{verification_code}，验证码将在10分钟后过期'
-    from_email = settings.DEFAULT_FROM_EMAIL  # 从配置中获取发件人
-    recipient_list = [email]
-    
-    send_mail(
-        subject,
-        message,
-        from_email,
-        recipient_list,
-        fail_silently=False,
-    )
+    enqueue_mail(subject, message, [email])
 
 
-def send_notice_email(email : str, content : str, title : str) :
+def send_notice_emails(emails : list, content : str, title : str) :
+    "每位收件人单独一封公告邮件"
     subject = f"THUPracticeOnline - 发布新公告 : {title}"
-    from_email = settings.DEFAULT_FROM_EMAIL
-    send_mail(subject, content, from_email, [email], fail_silently=False)
+    enqueue_mails(subject, content, emails)
 
 
 def send_email(subject : str, content : str, receipient_list : list) :
     "使用默认邮箱发送邮件"
     subject = f"THUPracticeonline - {subject}"
-    from_email = settings.DEFAULT_FROM_EMAIL
-    send_mail(subject, content, from_email, receipient_list, fail_silently=False)
\ No newline at end of file
+    enqueue_mail(subject, content, receipient_list)
@@ -0,0 +1,55 @@
+from itertools import groupby
+from .models import Question, Answer
+import csv
+
+# 每次从数据库读取的答卷人数，导出时内存占用与问卷答卷数量无关
+EXPORT_CHUNK_SIZE = 200
+
+class Echo:
+    "csv.writer 需要一个文件对象，write 直接返回写入的内容供流式响应使用"
+    def write(self, value):
+        return value
+
+def get_export_header(questionnaire) -> tuple[list, list] :
+    "返回题号列表及表头"
+    questions = list(Question.objects.filter(questionnaire=questionnaire).order_by('question_idx').values_list('question_idx', 'question_text'))
+    header = ['用户主键', '用户名'] + [f'{idx}. {text}' for idx, text in questions]
+    return [idx for idx, _ in questions], header
+
+def format_answer(answer) -> str :
+    if answer is None:
+        return ''
+    if isinstance(answer, list):
+        return '、'.join(str(item) for item in answer)
+    return str(answer)
+
+def iter_result_rows(questionnaire, question_idxs : list):
+    """
+    按用户分组逐行生成答卷，每位用户一行，未作答的题目留空。
+    PyMySQL 默认游标会把整个结果集读入内存，iterator() 并不能流式读取，
+    因此按用户主键分批（键集分页）查询，每批只读取 EXPORT_CHUNK_SIZE 位用户的答案。
+    """
+    answers = Answer.objects.filter(questionnaire=questionnaire)
+    last_user_id = 0
+    while True:
+        user_ids = list(
+            answers.filter(user_id__gt=last_user_id).order_by('user_id').values_list('user_id', flat=True).distinct()[:EXPORT_CHUNK_SIZE]
+        )
+        if not user_ids:
+            return
+        last_user_id = user_ids[-1]
+        batch = answers.filter(user_id__in=user_ids).order_by('user_id', 'question__question_idx').values_list(
+            'user_id', 'user__username', 'question__question_idx', 'answer'
+        )
+        for (user_id, username), user_answers in groupby(batch, key=lambda row: (row[0], row[1])):
+            answer_map = {question_idx: answer for _, _, question_idx, answer in user_answers}
+            yield [user_id, username] + [format_answer(answer_map.get(idx)) for idx in question_idxs]
+
+def stream_csv(questionnaire):
+    "逐行生成CSV内容"
+    question_idxs, header = get_export_header(questionnaire)
+    writer = csv.writer(Echo())
+    # 带BOM以便Excel正确识别中文
+    yield '\ufeff' + writer.writerow(header)
+    for row in iter_result_rows(questionnaire, question_idxs):
+        yield writer.writerow(row)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='question_text',
+            field=models.TextField(max_length=500),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['questionnaire', 'user'], name='answer_questionnaire_user_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def tally_answer(statistic, question_type, answer):
+    "计入一条答案，与迁移时的统计规则保持一致，不引用应用代码"
+    statistic.response_count += 1
+    if question_type == 'single':
+        keys = [str(answer)]
+    elif question_type == 'multiple':
+        keys = list(dict.fromkeys(str(option) for option in answer))
+    elif question_type == 'score':
+        keys = [f'{float(answer):g}']
+        statistic.score_sum += float(answer)
+    else:
+        keys = []
+    for key in keys:
+        statistic.counts[key] = statistic.counts.get(key, 0) + 1
+
+
+def backfill_statistics(apps, schema_editor):
+    "根据已有答案生成统计行"
+    Question = apps.get_model('votes', 'Question')
+    Answer = apps.get_model('votes', 'Answer')
+    QuestionStatistic = apps.get_model('votes', 'QuestionStatistic')
+    statistics = {}
+    question_types = {}
+    for question_id, question_type in Question.objects.values_list('id', 'question_type').iterator():
+        statistics[question_id] = QuestionStatistic(question_id=question_id)
+        question_types[question_id] = question_type
+    for question_id, answer in Answer.objects.values_list('question_id', 'answer').iterator():
+        tally_answer(statistics[question_id], question_types[question_id], answer)
+    QuestionStatistic.objects.bulk_create(statistics.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votes', '0002_answer_questionnaire_user_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('response_count', models.IntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('counts', models.JSONField(default=dict)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistic', to='votes.question')),
+            ],
+        ),
+        migrations.RunPython(backfill_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_submissions(apps, schema_editor):
+    "根据已有答案生成提交记录"
+    Answer = apps.get_model('votes', 'Answer')
+    Submission = apps.get_model('votes', 'Submission')
+    submissions = Answer.objects.values('user_id', 'questionnaire_id').annotate(submitted_at=Max('created_at'))
+    Submission.objects.bulk_create(
+        (Submission(**submission) for submission in submissions.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votes', '0003_questionstatistic'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('questionnaire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='votes.questionnaire')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('questionnaire', 'user')},
+            },
+        ),
+        migrations.RunPython(backfill_submissions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+PERMISSION_LEVELS = {'普通用户': 1, '普通管理员': 2, '超级管理员': 3}
+
+
+def backfill_permission_levels(apps, schema_editor):
+    "根据已有问卷的权限列表生成规范化的权限记录"
+    Questionnaire = apps.get_model('votes', 'Questionnaire')
+    QuestionnairePermission = apps.get_model('votes', 'QuestionnairePermission')
+    QuestionnairePermission.objects.bulk_create(
+        (
+            QuestionnairePermission(questionnaire_id=questionnaire_id, permission=PERMISSION_LEVELS[label])
+            for questionnaire_id, permissions in Questionnaire.objects.values_list('id', 'permissions').iterator()
+            for label in set(permissions or []) if label in PERMISSION_LEVELS
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votes', '0004_submission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionnairePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.IntegerField(choices=[(1, '普通用户'), (2, '普通管理员'), (3, '超级管理员')])),
+                ('questionnaire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='permission_levels', to='votes.questionnaire')),
+            ],
+            options={
+                'unique_together': {('permission', 'questionnaire')},
+            },
+        ),
+        migrations.RunPython(backfill_permission_levels, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from users.models import CustomUser
 
 # Create your models here.
@@ -12,6 +13,17 @@ class Questionnaire(models.Model):
     def __str__(self):
         return self.title
 
+class QuestionnairePermission(models.Model):
+    "问卷权限列表的规范化存储，便于在数据库中按用户权限筛选问卷"
+    questionnaire = models.ForeignKey(Questionnaire, on_delete=models.CASCADE, related_name='permission_levels')
+    permission = models.IntegerField(choices=CustomUser.UserPermissions)
+
+    class Meta:
+        unique_together = ('permission', 'questionnaire')
+
+    def __str__(self):
+        return f"{self.questionnaire} - {self.get_permission_display()}"
+
 class Question(models.Model):
     QUESTION_TYPE_CHOICES = [
         ('single', '单选'),
@@ -43,6 +55,33 @@ class Answer(models.Model):
 
     class Meta:
         unique_together = ('user', 'questionnaire', 'question')
+        indexes = [
+            # 按问卷导出结果时按用户顺序读取
+            models.Index(fields=['questionnaire', 'user'], name='answer_questionnaire_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.question}"
+
+class QuestionStatistic(models.Model):
+    "随提交增量维护的单题统计，counts 为选项或分数到人数的映射"
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='statistic')
+    response_count = models.IntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    counts = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"{self.question} - {self.response_count}"
+
+class Submission(models.Model):
+    "每位用户对每份问卷的提交记录，用于统计完成情况"
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    questionnaire = models.ForeignKey(Questionnaire, on_delete=models.CASCADE, related_name='submissions')
+    submitted_at = models.DateTimeField(default=timezone.now) # 最近一次提交时间
+
+    class Meta:
+        # 联合唯一索引以问卷开头，按问卷查询提交记录时可直接使用
+        unique_together = ('questionnaire', 'user')
 
     def __str__(self):
-        return f"{self.user} - {self.question}"
\ No newline at end of file
+        return f"{self.user} - {self.questionnaire}"
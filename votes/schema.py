@@ -0,0 +1,35 @@
+from functools import lru_cache
+from .models import Question
+
+# 每个进程缓存的已发布问卷数
+SCHEMA_CACHE_SIZE = 128
+
+class CompiledQuestion:
+    "预处理后的问题，选项为 frozenset，校验答案时无需访问数据库"
+    __slots__ = ('id', 'question_type', 'options', 'min_score', 'max_score', 'step')
+
+    def __init__(self, id, question_type, options, min_score, max_score, step):
+        self.id = id
+        self.question_type = question_type
+        self.options = frozenset(option for option in options or [] if isinstance(option, (str, int, float)))
+        self.min_score = min_score
+        self.max_score = max_score
+        self.step = step
+
+def compile_questions(questionnaire_id) -> dict :
+    "一次查询取出问卷的全部问题，返回题号到预处理问题的映射"
+    questions = Question.objects.filter(questionnaire_id=questionnaire_id).values_list(
+        'question_idx', 'id', 'question_type', 'options', 'min_score', 'max_score', 'step'
+    )
+    return {question_idx: CompiledQuestion(*fields) for question_idx, *fields in questions}
+
+@lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def _get_published_schema(questionnaire_id, created_at) -> dict :
+    # 以创建时间参与缓存键，问卷删除后主键被复用也不会命中旧结构
+    return compile_questions(questionnaire_id)
+
+def get_questionnaire_schema(questionnaire) -> dict :
+    "已发布的问卷不可修改，其结构在进程内缓存；未发布的问卷每次重新读取"
+    if questionnaire.is_published:
+        return _get_published_schema(questionnaire.id, questionnaire.created_at)
+    return compile_questions(questionnaire.id)
@@ -119,12 +119,23 @@ class QuestionnaireSerializer(serializers.ModelSerializer):
         
         return instance
 
+class QuestionnaireSummarySerializer(serializers.ModelSerializer):
+    "问卷列表只返回概要，题目在打开问卷时再获取"
+    question_count = serializers.IntegerField(read_only=True)
+    submitted = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Questionnaire
+        fields = ['id', 'title', 'created_at', 'is_published', 'is_closed', 'question_count', 'submitted']
+
 class AnswerSerializer(serializers.Serializer):
     question_idx = serializers.IntegerField(required=True)
     answer = serializers.JSONField(required=True)
 
     def validate(self, attrs):
-        question = self.context.get('question')
+        # 批量校验时通过题号到问题的映射查找，避免逐题查询
+        questions = self.context.get('questions')
+        question = questions.get(attrs['question_idx']) if questions is not None else self.context.get('question')
         if not question:
             raise serializers.ValidationError("未找到对应问题")
 
@@ -156,8 +167,12 @@ class AnswerSerializer(serializers.Serializer):
             raise serializers.ValidationError(invalid_answer)
     
     def _multiple_validate(self, question, answer):
-        if not isinstance(answer, list) or any(opt not in question.options for opt in answer):
+        try:
+            if not isinstance(answer, list) or any(opt not in question.options for opt in answer):
                 raise serializers.ValidationError(invalid_answer)
+        except TypeError:
+            # 选项集合为 frozenset，列表、字典等不可哈希的选项直接判为非法
+            raise serializers.ValidationError(invalid_answer)
     
     def _score_validate(self, question, answer):
         try:
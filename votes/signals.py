@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from .models import Questionnaire, QuestionnairePermission, Question, QuestionStatistic
+from users.models import CustomUser
+from .tally import subtract_user_answers
+
+@receiver(post_save, sender=Question)
+def create_question_statistic(sender, instance, created, **kwargs):
+    " 创建问题时同时创建统计行，提交答案时只需更新 "
+    if created:
+        QuestionStatistic.objects.get_or_create(question=instance)
+
+def get_permission_levels(labels) -> set :
+    " 将问卷的权限名称列表转换为权限等级，忽略无法识别的名称 "
+    return {value for value, label in CustomUser.UserPermissions.choices if label in (labels or [])}
+
+@receiver(post_save, sender=Questionnaire)
+def sync_permission_levels(sender, instance, created, update_fields=None, **kwargs):
+    " 保存问卷时同步规范化的权限记录 "
+    if update_fields is not None and 'permissions' not in update_fields:
+        return
+    levels = get_permission_levels(instance.permissions)
+    if not created:
+        QuestionnairePermission.objects.filter(questionnaire=instance).exclude(permission__in=levels).delete()
+    QuestionnairePermission.objects.bulk_create(
+        [QuestionnairePermission(questionnaire=instance, permission=level) for level in levels],
+        ignore_conflicts=True,
+    )
+
+@receiver(pre_delete, sender=CustomUser)
+def subtract_deleted_user_answers(sender, instance, **kwargs):
+    " 删除用户会级联删除其答案，先从统计中撤销；pre_delete 在删除的事务中发送 "
+    subtract_user_answers(instance.pk)
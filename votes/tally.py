@@ -0,0 +1,89 @@
+from .models import Answer, QuestionStatistic
+
+def score_key(score) -> str :
+    "统一分数的表示，避免 3、3.0、'3' 被计为不同分数"
+    return f'{float(score):g}'
+
+def answer_keys(question_type : str, answer) -> list :
+    "答案计入的统计项，填空题只计作答人数"
+    if question_type == 'single':
+        return [str(answer)]
+    if question_type == 'multiple':
+        return list(dict.fromkeys(str(option) for option in answer))
+    if question_type == 'score':
+        return [score_key(answer)]
+    return []
+
+def tally_answer(statistic : QuestionStatistic, question_type : str, answer, sign : int):
+    "sign 为 1 时计入答案，为 -1 时撤销答案"
+    statistic.response_count += sign
+    for key in answer_keys(question_type, answer):
+        count = statistic.counts.get(key, 0) + sign
+        if count:
+            statistic.counts[key] = count
+        else:
+            statistic.counts.pop(key, None)
+    if question_type == 'score':
+        statistic.score_sum += sign * float(answer)
+
+def lock_statistics(question_ids) -> dict :
+    "按问题主键顺序锁定统计行，避免并发提交互相死锁，需在事务中调用"
+    statistics = QuestionStatistic.objects.select_for_update().filter(question_id__in=question_ids).order_by('question_id')
+    return {statistic.question_id: statistic for statistic in statistics}
+
+def lock_or_create_statistics(question_types : dict) -> dict :
+    """
+    锁定问题的统计行，缺少统计行的问题（如绕过信号创建的问题）按已有答案重新统计后补建。
+    question_types 为问题主键到题型的映射，需在事务中调用
+    """
+    statistics = lock_statistics(question_types)
+    missing = [question_id for question_id in question_types if question_id not in statistics]
+    if missing:
+        created = {question_id: QuestionStatistic(question_id=question_id) for question_id in missing}
+        for question_id, answer in Answer.objects.filter(question_id__in=missing).values_list('question_id', 'answer'):
+            tally_answer(created[question_id], question_types[question_id], answer, 1)
+        QuestionStatistic.objects.bulk_create(created.values(), ignore_conflicts=True)
+        statistics.update(lock_statistics(missing))
+    return statistics
+
+def subtract_user_answers(user_id):
+    "删除用户前从统计中撤销其全部答案，级联删除答案不会经过提交流程"
+    answers = list(Answer.objects.filter(user_id=user_id).values_list('question_id', 'question__question_type', 'answer'))
+    if not answers:
+        return
+    statistics = lock_statistics({question_id for question_id, _, _ in answers})
+    for question_id, question_type, answer in answers:
+        if question_id in statistics:
+            tally_answer(statistics[question_id], question_type, answer, -1)
+    QuestionStatistic.objects.bulk_update(statistics.values(), ['response_count', 'score_sum', 'counts'])
+
+def update_statistics(statistics : dict, question_types : dict, old_answers : dict, new_answers : dict):
+    "用旧答案和新答案修正统计，重复提交时先撤销旧答案，一次写回所有统计行"
+    for question_id, answer in new_answers.items():
+        statistic = statistics[question_id]
+        if question_id in old_answers:
+            tally_answer(statistic, question_types[question_id], old_answers[question_id], -1)
+        tally_answer(statistic, question_types[question_id], answer, 1)
+    QuestionStatistic.objects.bulk_update(
+        [statistics[question_id] for question_id in new_answers], ['response_count', 'score_sum', 'counts']
+    )
+
+def build_statistics(question, statistic : QuestionStatistic | None) -> dict :
+    "根据统计行生成单题统计结果"
+    response_count = statistic.response_count if statistic else 0
+    counts = statistic.counts if statistic else {}
+    result = {
+        'question_idx': question.question_idx,
+        'question_text': question.question_text,
+        'question_type': question.question_type,
+        'response_count': response_count,
+    }
+    if question.question_type in ('single', 'multiple'):
+        result['option_counts'] = {str(option): counts.get(str(option), 0) for option in question.options or []}
+    elif question.question_type == 'score':
+        scores = sorted(counts, key=float)
+        result['histogram'] = {score: counts[score] for score in scores}
+        result['mean'] = statistic.score_sum / response_count if response_count else None
+        result['min'] = float(scores[0]) if scores else None
+        result['max'] = float(scores[-1]) if scores else None
+    return result
@@ -2,11 +2,16 @@
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Questionnaire, Question, Answer
+from .models import Questionnaire, Question, Answer, Submission, QuestionStatistic
+from .schema import get_questionnaire_schema
+from .serializers import AnswerSerializer
 from users.models import CustomUser
 from rest_framework_simplejwt.tokens import RefreshToken
 from utils.test import create_normal_user, create_super_administrator
 from django.urls import reverse
+import csv
+import io
+from unittest.mock import patch
 
 # 公共基础测试类
 class BaseQuestionnaireTest(TestCase):
@@ -95,6 +100,60 @@ class SubmitAnswerViewTests(BaseQuestionnaireTest):
         response = self.client.post(self.url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_resubmission_updates_answers(self):
+        """测试重复提交会覆盖原答案"""
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.normal_user).access_token)
+        self.client.post(self.url, {"id": self.questionnaire.id, "answers": [{"question_idx": 1, "answer": "A"}]}, format='json')
+        data = {
+            "id": self.questionnaire.id,
+            "answers": [
+                {"question_idx": 1, "answer": "B"},
+                {"question_idx": 2, "answer": "自由文本"}
+            ]
+        }
+        # 已发布问卷的结构已缓存，查询次数与题目数量无关
+        with self.assertNumQueries(8):
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Answer.objects.count(), 2)
+        self.assertEqual(Answer.objects.get(question__question_idx=1).answer, "B")
+
+    def test_invalid_answer_writes_nothing(self):
+        """测试任一答案非法时不写入任何答案"""
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.normal_user).access_token)
+        data = {
+            "id": self.questionnaire.id,
+            "answers": [
+                {"question_idx": 1, "answer": "A"},
+                {"question_idx": 3, "answer": "不存在的题目"}
+            ]
+        }
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Answer.objects.count(), 0)
+
+class QuestionnaireSchemaTests(BaseQuestionnaireTest):
+    def test_published_schema_cached(self):
+        """测试已发布问卷的结构只读取一次数据库"""
+        questionnaire = Questionnaire.objects.create(title="结构", permissions=["普通用户"], is_published=True)
+        Question.objects.create(
+            questionnaire=questionnaire, question_idx=1, question_text="多选", question_type="multiple", options=["A", "B", 1]
+        )
+        schema = get_questionnaire_schema(questionnaire)
+        self.assertEqual(schema[1].options, frozenset(["A", "B", 1]))
+        with self.assertNumQueries(0):
+            self.assertIs(get_questionnaire_schema(questionnaire), schema)
+
+    def test_unhashable_option_rejected(self):
+        """测试多选答案中包含不可哈希的值时判为非法"""
+        questionnaire = Questionnaire.objects.create(title="结构", permissions=["普通用户"], is_published=True)
+        Question.objects.create(
+            questionnaire=questionnaire, question_idx=1, question_text="多选", question_type="multiple", options=["A", "B"]
+        )
+        context = {'questions': get_questionnaire_schema(questionnaire)}
+        self.assertTrue(AnswerSerializer(data={"question_idx": 1, "answer": ["A", "B"]}, context=context).is_valid())
+        self.assertFalse(AnswerSerializer(data={"question_idx": 1, "answer": [["A"]]}, context=context).is_valid())
+
 class GetQuestionnaireListViewTests(BaseQuestionnaireTest):
     def setUp(self):
         self.client = APIClient()
@@ -117,6 +176,39 @@ class GetQuestionnaireListViewTests(BaseQuestionnaireTest):
         response = self.client.get(self.url)
         self.assertEqual(len(response.data["results"]), 2)
 
+    def test_get_available_questionaire(self):
+        """测试只返回当前用户可填写的问卷概要"""
+        questionnaire = Questionnaire.objects.get(title="用户问卷")
+        Question.objects.create(questionnaire=questionnaire, question_idx=1, question_text="填空", question_type="text")
+        Questionnaire.objects.create(title="已截止问卷", permissions=["普通用户"], is_published=True, is_closed=True)
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.normal_user).access_token)
+        response = self.client.get(reverse('available-questionaire'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['title'] for item in response.data["results"]], ["用户问卷"])
+        self.assertEqual(response.data["results"][0]['question_count'], 1)
+        self.assertFalse(response.data["results"][0]['submitted'])
+        self.assertNotIn('questions', response.data["results"][0])
+
+    def test_permission_change_updates_available(self):
+        """测试修改问卷权限后可填写列表随之变化"""
+        questionnaire = Questionnaire.objects.get(title="管理员问卷")
+        questionnaire.permissions = ["普通用户"]
+        questionnaire.save()
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.normal_user).access_token)
+        response = self.client.get(reverse('available-questionaire'))
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_get_detail(self):
+        """测试打开问卷时返回全部题目，无权限的问卷不可查看"""
+        questionnaire = Questionnaire.objects.get(title="用户问卷")
+        Question.objects.create(questionnaire=questionnaire, question_idx=1, question_text="填空", question_type="text")
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.normal_user).access_token)
+        response = self.client.get(reverse('questionaire-detail'), {'id': questionnaire.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['questions']), 1)
+        response = self.client.get(reverse('questionaire-detail'), {'id': Questionnaire.objects.get(title="管理员问卷").id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 class UpdateQuestionnaireViewTests(BaseQuestionnaireTest):
     def setUp(self):
         self.client = APIClient()
@@ -185,4 +277,126 @@ class QuestionnaireResultViewTests(BaseQuestionnaireTest):
         data = {"id": self.questionnaire.id}
         response = self.client.post(self.url, data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data["results"]), 1)
\ No newline at end of file
+        self.assertEqual(len(response.data["results"]), 1)
+
+class QuestionnaireStatisticsViewTests(BaseQuestionnaireTest):
+    def setUp(self):
+        self.client = APIClient()
+        self.questionnaire = Questionnaire.objects.create(title="统计问卷", permissions=["超级管理员", "普通用户"], is_published=True)
+        Question.objects.create(
+            questionnaire=self.questionnaire, question_idx=1, question_text="多选", question_type="multiple", options=["A", "B", "C"]
+        )
+        Question.objects.create(
+            questionnaire=self.questionnaire, question_idx=2, question_text="打分", question_type="score", min_score=1, max_score=5, step=1
+        )
+        Question.objects.create(questionnaire=self.questionnaire, question_idx=3, question_text="填空", question_type="text")
+
+    def submit(self, user, answers):
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(user).access_token)
+        response = self.client.post(reverse('submit-questionaire'), {"id": self.questionnaire.id, "answers": answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_statistics_after_resubmission(self):
+        """测试重复提交后统计被正确修正"""
+        self.submit(self.normal_user, [{"question_idx": 1, "answer": ["A", "B"]}, {"question_idx": 2, "answer": 2}])
+        self.submit(self.super_admin, [{"question_idx": 1, "answer": ["B"]}, {"question_idx": 2, "answer": 5}, {"question_idx": 3, "answer": "文本"}])
+        self.submit(self.normal_user, [{"question_idx": 1, "answer": ["C"]}, {"question_idx": 2, "answer": 4.0}])
+
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.super_admin).access_token)
+        response = self.client.post(reverse('questionaire-statistics'), {"id": self.questionnaire.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        multiple, score, text = response.data['results']
+        self.assertEqual(multiple['response_count'], 2)
+        self.assertEqual(multiple['option_counts'], {"A": 0, "B": 1, "C": 1})
+        self.assertEqual(score['histogram'], {"4": 1, "5": 1})
+        self.assertEqual((score['mean'], score['min'], score['max']), (4.5, 4, 5))
+        self.assertEqual(text['response_count'], 1)
+
+    def test_missing_statistic_rebuilt(self):
+        """测试缺少统计行的问题在提交时按已有答案补建"""
+        self.submit(self.normal_user, [{"question_idx": 1, "answer": ["A"]}])
+        QuestionStatistic.objects.filter(question__question_idx=1).delete()
+        self.submit(self.super_admin, [{"question_idx": 1, "answer": ["A", "C"]}])
+        statistic = QuestionStatistic.objects.get(question__question_idx=1)
+        self.assertEqual(statistic.response_count, 2)
+        self.assertEqual(statistic.counts, {"A": 2, "C": 1})
+
+    def test_deleted_user_subtracted(self):
+        """测试删除用户后其答案从统计中撤销"""
+        user = create_normal_user('leaving')
+        self.submit(self.normal_user, [{"question_idx": 2, "answer": 3}])
+        self.submit(user, [{"question_idx": 1, "answer": ["B"]}, {"question_idx": 2, "answer": 5}])
+        user.delete()
+        multiple = QuestionStatistic.objects.get(question__question_idx=1)
+        score = QuestionStatistic.objects.get(question__question_idx=2)
+        self.assertEqual((multiple.response_count, multiple.counts), (0, {}))
+        self.assertEqual((score.response_count, score.score_sum, score.counts), (1, 3, {"3": 1}))
+
+    def test_normal_user_forbidden(self):
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.normal_user).access_token)
+        response = self.client.post(reverse('questionaire-statistics'), {"id": self.questionnaire.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class QuestionnaireCompletionViewTests(BaseQuestionnaireTest):
+    def setUp(self):
+        self.client = APIClient()
+        self.other_user = create_normal_user('other')
+        self.questionnaire = Questionnaire.objects.create(title="完成情况", permissions=["普通用户"], is_published=True)
+        Question.objects.create(questionnaire=self.questionnaire, question_idx=1, question_text="填空", question_type="text")
+        self.url = reverse('questionaire-completion')
+
+    def test_completion(self):
+        """测试重复提交只记一次，并返回未提交的目标用户"""
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.normal_user).access_token)
+        for text in ("第一次", "第二次"):
+            response = self.client.post(reverse('submit-questionaire'), {"id": self.questionnaire.id, "answers": [{"question_idx": 1, "answer": text}]}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Submission.objects.filter(questionnaire=self.questionnaire).count(), 1)
+
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.super_admin).access_token)
+        response = self.client.post(self.url, {"id": self.questionnaire.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['target_count'], 2)
+        self.assertEqual(response.data['submitted_count'], 1)
+        self.assertEqual(response.data['completion_ratio'], 0.5)
+        self.assertEqual([user['username'] for user in response.data['non_respondents']], ['other'])
+
+class ExportQuestionnaireResultViewTests(BaseQuestionnaireTest):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.super_admin).access_token)
+        self.questionnaire = Questionnaire.objects.create(title="导出问卷", permissions=["超级管理员", "普通用户"], is_published=True)
+        self.single = Question.objects.create(
+            questionnaire=self.questionnaire, question_idx=1, question_text="单选", question_type="single", options=["A", "B"]
+        )
+        self.multiple = Question.objects.create(
+            questionnaire=self.questionnaire, question_idx=2, question_text="多选", question_type="multiple", options=["A", "B"]
+        )
+        Answer.objects.create(user=self.normal_user, questionnaire=self.questionnaire, question=self.single, answer="A")
+        Answer.objects.create(user=self.normal_user, questionnaire=self.questionnaire, question=self.multiple, answer=["A", "B"])
+        Answer.objects.create(user=self.super_admin, questionnaire=self.questionnaire, question=self.multiple, answer=["B"])
+        self.url = reverse('questionaire-export')
+
+    def test_export_csv(self):
+        """测试流式导出CSV，每位用户一行"""
+        response = self.client.get(self.url, {'id': self.questionnaire.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0], ['用户主键', '用户名', '1. 单选', '2. 多选'])
+        self.assertEqual(rows[1:], [
+            [str(self.super_admin.id), self.super_admin.username, '', 'B'],
+            [str(self.normal_user.id), 'user', 'A', 'A、B'],
+        ])
+
+    def test_export_chunked(self):
+        """测试按用户分批读取时结果不变"""
+        with patch('votes.export.EXPORT_CHUNK_SIZE', 1):
+            response = self.client.get(self.url, {'id': self.questionnaire.id})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.super_admin.id), str(self.normal_user.id)])
+        self.assertEqual(rows[2][2:], ['A', 'A、B'])
+
+    def test_export_invalid(self):
+        response = self.client.get(self.url, {'id': 10000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
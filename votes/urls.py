@@ -1,13 +1,18 @@
 from django.urls import path
-from .views import CreateQuestionnaireView, UpdateQuestionnaireView, GetQuestionnaireListView, PublishQuestionnaireView, CloseQuestionnaireView, SubmitAnswerView, QuestionnaireResultView, DeleteQuestionnaireView
+from .views import CreateQuestionnaireView, UpdateQuestionnaireView, GetQuestionnaireListView, GetAvailableQuestionnaireListView, GetQuestionnaireDetailView, PublishQuestionnaireView, CloseQuestionnaireView, SubmitAnswerView, QuestionnaireResultView, DeleteQuestionnaireView, ExportQuestionnaireResultView, QuestionnaireStatisticsView, QuestionnaireCompletionView
 
 urlpatterns = [
     path('create/', CreateQuestionnaireView.as_view(), name='create-questionaire'),
     path('update/', UpdateQuestionnaireView.as_view(), name='update-questionaire'),
     path('get/', GetQuestionnaireListView.as_view(), name='get-questionaire'),
+    path('available/', GetAvailableQuestionnaireListView.as_view(), name='available-questionaire'),
+    path('detail/', GetQuestionnaireDetailView.as_view(), name='questionaire-detail'),
     path('publish/', PublishQuestionnaireView.as_view(), name='publish-questionaire'),
     path('close/', CloseQuestionnaireView.as_view(), name='close-questionaire'),
     path('submit/', SubmitAnswerView.as_view(), name='submit-questionaire'),
     path('result/', QuestionnaireResultView.as_view(), name='questionaire-result'),
+    path('statistics/', QuestionnaireStatisticsView.as_view(), name='questionaire-statistics'),
+    path('completion/', QuestionnaireCompletionView.as_view(), name='questionaire-completion'),
+    path('export/', ExportQuestionnaireResultView.as_view(), name='questionaire-export'),
     path('delete/', DeleteQuestionnaireView.as_view(), name='delete-questionaire'),
 ]
\ No newline at end of file
@@ -2,12 +2,20 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Questionnaire, Question, Answer
-from .serializers import QuestionnaireSerializer, AnswerSerializer
+from .models import Questionnaire, Answer, Submission
+from .serializers import QuestionnaireSerializer, QuestionnaireSummarySerializer, AnswerSerializer
 from users.models import CustomUser
 from utils.get import get_user_from_request
 from utils.check import check_super_administrator_from_request
 from utils.pagination import CustomPagination
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from .export import stream_csv
+from .schema import get_questionnaire_schema
+from .tally import lock_or_create_statistics, update_statistics, build_statistics
 
 not_permitted = "用户权限不足"
 vote_miss = "问卷不存在"
@@ -47,7 +55,7 @@ class UpdateQuestionnaireView(APIView):
 class GetQuestionnaireListView(ListAPIView):
     serializer_class = QuestionnaireSerializer
     pagination_class = CustomPagination
-    queryset = Questionnaire.objects.all().order_by("id")
+    queryset = Questionnaire.objects.prefetch_related('questions').order_by("id")
 
     def list(self, request, *args, **kwargs):
         user = get_user_from_request(request)
@@ -56,6 +64,39 @@ class GetQuestionnaireListView(ListAPIView):
 
         return super().list(request, *args, **kwargs)
 
+class GetAvailableQuestionnaireListView(ListAPIView):
+    "返回当前用户可以填写的问卷概要，即已发布、未截止且权限包含该用户的问卷"
+    serializer_class = QuestionnaireSummarySerializer
+    pagination_class = CustomPagination
+
+    def list(self, request, *args, **kwargs):
+        user = get_user_from_request(request)
+        if isinstance(user, Response):
+            return user
+        self.queryset = Questionnaire.objects.filter(
+            is_published=True, is_closed=False, permission_levels__permission=user.user_permission
+        ).annotate(
+            question_count=Count('questions'),
+            submitted=Exists(Submission.objects.filter(questionnaire=OuterRef('pk'), user=user)),
+        ).order_by("-id")
+        return super().list(request, *args, **kwargs)
+
+class GetQuestionnaireDetailView(APIView):
+    "返回单份问卷及其全部题目，超级管理员可查看任意问卷"
+    def get(self, request):
+        user = get_user_from_request(request)
+        if isinstance(user, Response):
+            return user
+        try:
+            questionnaire = Questionnaire.objects.prefetch_related('questions').get(id=request.query_params.get('id'))
+        except (Questionnaire.DoesNotExist, ValueError):
+            return Response({"error": vote_miss}, status=status.HTTP_400_BAD_REQUEST)
+        if user.user_permission != CustomUser.UserPermissions.super_administrator and (
+            not questionnaire.is_published or user.get_user_permission_display() not in questionnaire.permissions
+        ):
+            return Response({"error": not_permitted}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(QuestionnaireSerializer(questionnaire).data, status=status.HTTP_200_OK)
+
 class PublishQuestionnaireView(APIView):
     def post(self, request):
         try:
@@ -66,7 +107,7 @@ class PublishQuestionnaireView(APIView):
             if questionnaire.is_closed == True:
                 questionnaire.is_closed = False
             questionnaire.is_published = True
-            questionnaire.save()
+            questionnaire.save(update_fields=['is_published', 'is_closed'])
             return Response({"message": "成功发布问卷"}, status=status.HTTP_200_OK)
         except Questionnaire.DoesNotExist:
             return Response({"error": vote_miss}, status=status.HTTP_400_BAD_REQUEST)
@@ -80,11 +121,17 @@ class CloseQuestionnaireView(APIView):
             if questionnaire.is_published == False:
                 return Response({"error": "无法截止未发布的问卷"}, status=status.HTTP_400_BAD_REQUEST)
             questionnaire.is_closed = True
-            questionnaire.save()
+            questionnaire.save(update_fields=['is_closed'])
             return Response({"message": "成功截止收集问卷"}, status=status.HTTP_200_OK)
         except Questionnaire.DoesNotExist:
             return Response({"error": vote_miss}, status=status.HTTP_400_BAD_REQUEST)
 
+def get_conflict_kwargs(unique_fields : list) -> dict :
+    "MySQL 的 ON DUPLICATE KEY UPDATE 不支持指定冲突字段，其余数据库按 unique_together 指定"
+    if connection.features.supports_update_conflicts_with_target:
+        return {'unique_fields': unique_fields}
+    return {}
+
 class SubmitAnswerView(APIView):
     def post(self, request):
         user = get_user_from_request(request)
@@ -98,24 +145,39 @@ class SubmitAnswerView(APIView):
             if not questionnaire.is_published or questionnaire.is_closed:
                 return Response({"error": "问卷未开放提交"}, status=status.HTTP_400_BAD_REQUEST)
             
-            for answer in data['answers']:
-                question = Question.objects.get(
-                    questionnaire=questionnaire,
-                    question_idx=answer['question_idx']
+            # 使用预处理的问卷结构校验全部答案，再统一写入
+            questions = get_questionnaire_schema(questionnaire)
+            serializer = AnswerSerializer(data=data['answers'], many=True, context={'questions': questions})
+            serializer.is_valid(raise_exception=True)
+            question_idxs = [answer['question_idx'] for answer in serializer.validated_data]
+            if len(set(question_idxs)) != len(question_idxs):
+                return Response({"error": "同一题目不能重复作答"}, status=status.HTTP_400_BAD_REQUEST)
+
+            new_answers = {questions[answer['question_idx']].id: answer['answer'] for answer in serializer.validated_data}
+            question_types = {question.id: question.question_type for question in questions.values()}
+            answers = [
+                Answer(user=user, questionnaire=questionnaire, question_id=question_id, answer=answer)
+                for question_id, answer in new_answers.items()
+            ]
+            with transaction.atomic():
+                # 先锁定统计行再读取旧答案，保证重复提交时统计被正确修正
+                statistics = lock_or_create_statistics({question_id: question_types[question_id] for question_id in new_answers})
+                old_answers = dict(Answer.objects.filter(
+                    user=user, questionnaire=questionnaire, question_id__in=new_answers
+                ).values_list('question_id', 'answer'))
+                Answer.objects.bulk_create(
+                    answers, update_conflicts=True, update_fields=['answer'],
+                    **get_conflict_kwargs(['user', 'questionnaire', 'question'])
                 )
-                serializer = AnswerSerializer(data=answer, context={'question': question})
-                serializer.is_valid(raise_exception=True)
-                Answer.objects.update_or_create(
-                    user=user,
-                    questionnaire=questionnaire,
-                    question=question,
-                    defaults={'answer': answer['answer']}
+                update_statistics(statistics, question_types, old_answers, new_answers)
+                Submission.objects.bulk_create(
+                    [Submission(user=user, questionnaire=questionnaire, submitted_at=timezone.now())],
+                    update_conflicts=True, update_fields=['submitted_at'],
+                    **get_conflict_kwargs(['questionnaire', 'user'])
                 )
             return Response({"message": "成功提交问卷"}, status=status.HTTP_200_OK)
         except Questionnaire.DoesNotExist:
             return Response({"error": vote_miss}, status=status.HTTP_400_BAD_REQUEST)
-        except Question.DoesNotExist:
-            return Response({"error": "问题不存在"}, status=status.HTTP_400_BAD_REQUEST)
 
 class QuestionnaireResultView(APIView):
     def post(self, request):
@@ -124,20 +186,74 @@ class QuestionnaireResultView(APIView):
         try:
             questionnaire = Questionnaire.objects.get(id=request.data['id'])
             
-            answers = Answer.objects.filter(questionnaire=questionnaire)
+            answers = Answer.objects.filter(questionnaire=questionnaire).values_list(
+                'user_id', 'question__question_idx', 'answer'
+            )
             results = {}
-            for answer in answers:
-                user_id = answer.user.id
+            for user_id, question_idx, answer in answers:
                 if user_id not in results:
                     results[user_id] = {"user_id": user_id, "answers": []}
                 results[user_id]["answers"].append({
-                    "question_idx": answer.question.question_idx,
-                    "answer": answer.answer
+                    "question_idx": question_idx,
+                    "answer": answer
                 })
             return Response({"results": list(results.values())}, status=status.HTTP_200_OK)
         except Questionnaire.DoesNotExist:
             return Response({"error": vote_miss}, status=status.HTTP_400_BAD_REQUEST)
 
+class QuestionnaireStatisticsView(APIView):
+    "返回增量维护的单题统计，耗时只与题目数量有关"
+    def post(self, request):
+        if not check_super_administrator_from_request(request):
+            return Response({"error": "无权查看结果"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            questionnaire = Questionnaire.objects.get(id=request.data.get('id'))
+        except (Questionnaire.DoesNotExist, ValueError):
+            return Response({"error": vote_miss}, status=status.HTTP_400_BAD_REQUEST)
+
+        questions = questionnaire.questions.select_related('statistic').order_by('question_idx')
+        results = [build_statistics(question, getattr(question, 'statistic', None)) for question in questions]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+class QuestionnaireCompletionView(APIView):
+    "返回问卷的完成率及未提交的用户，目标用户为权限在问卷权限列表中的用户"
+    def post(self, request):
+        if not check_super_administrator_from_request(request):
+            return Response({"error": "无权查看结果"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            questionnaire = Questionnaire.objects.get(id=request.data.get('id'))
+        except (Questionnaire.DoesNotExist, ValueError):
+            return Response({"error": vote_miss}, status=status.HTTP_400_BAD_REQUEST)
+
+        permissions = [value for value, label in CustomUser.UserPermissions.choices if label in questionnaire.permissions]
+        submitted = Submission.objects.filter(questionnaire=questionnaire, user=OuterRef('pk'))
+        targets = CustomUser.objects.filter(user_permission__in=permissions).annotate(submitted=Exists(submitted))
+        counts = targets.aggregate(target_count=Count('id'), submitted_count=Count('id', filter=Q(submitted=True)))
+        non_respondents = list(targets.filter(submitted=False).order_by('id').values('id', 'username', 'email'))
+        return Response({
+            "target_count": counts['target_count'],
+            "submitted_count": counts['submitted_count'],
+            "completion_ratio": counts['submitted_count'] / counts['target_count'] if counts['target_count'] else 0,
+            "non_respondents": non_respondents,
+        }, status=status.HTTP_200_OK)
+
+class ExportQuestionnaireResultView(APIView):
+    """
+    以CSV流式导出问卷结果，每位用户一行。
+    Excel 文件必须完整写出后才能发送，大问卷可能超过 uWSGI 的 harakiri，因此只提供CSV导出。
+    """
+    def get(self, request):
+        if not check_super_administrator_from_request(request):
+            return Response({"error": "无权查看结果"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            questionnaire = Questionnaire.objects.get(id=request.query_params.get('id'))
+        except (Questionnaire.DoesNotExist, ValueError):
+            return Response({"error": vote_miss}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(stream_csv(questionnaire), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = content_disposition_header(True, f'{questionnaire.title}.csv')
+        return response
+
 class DeleteQuestionnaireView(APIView):
     def post(self, request):
         if not check_super_administrator_from_request(request):